@@ -1,4 +1,5 @@
 from fastapi import FastAPI, WebSocket
+from typing import List
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import asyncio
@@ -13,14 +14,24 @@ current_conversation_id = None
 async def read_root():
     return FileResponse("index.html")
 
-@app.post("/api/results")
-async def receive_results(data: dict):
-    global conversations, current_conversation_id
+def store_result(data: dict):
+    global current_conversation_id
     conv_id = data.get('conversation_id')
     conversations[conv_id] = data
     current_conversation_id = conv_id
+
+@app.post("/api/results")
+async def receive_results(data: dict):
+    store_result(data)
     return {"status": "success"}
 
+@app.post("/api/results/bulk")
+async def receive_results_bulk(data: List[dict]):
+    """Batched results from the evaluation service publisher, oldest first"""
+    for result in data:
+        store_result(result)
+    return {"status": "success", "received": len(data)}
+
 @app.get("/api/results")
 async def get_results():
     if current_conversation_id and current_conversation_id in conversations:
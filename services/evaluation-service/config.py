@@ -1,4 +1,5 @@
 import os
+import json
 
 # Judge LLM Configuration
 JUDGE_LLM_URL = os.getenv("JUDGE_LLM_URL", "http://judge-llm:11434")
@@ -6,3 +7,56 @@ JUDGE_LLM_URL = os.getenv("JUDGE_LLM_URL", "http://judge-llm:11434")
 # Ollama Configuration
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
 OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "7200"))
+
+# Incremental re-evaluation (per chat_id state kept in memory)
+CONVERSATION_STATE_MAX_CHATS = int(os.getenv("CONVERSATION_STATE_MAX_CHATS", "10000"))
+
+# Judge admission control (adaptive concurrency + token bucket)
+JUDGE_CONCURRENCY_INITIAL = int(os.getenv("JUDGE_CONCURRENCY_INITIAL", "2"))
+JUDGE_CONCURRENCY_MIN = int(os.getenv("JUDGE_CONCURRENCY_MIN", "1"))
+JUDGE_CONCURRENCY_MAX = int(os.getenv("JUDGE_CONCURRENCY_MAX", "8"))
+JUDGE_LATENCY_TOLERANCE = float(os.getenv("JUDGE_LATENCY_TOLERANCE", "2.0"))
+JUDGE_BACKOFF_RATIO = float(os.getenv("JUDGE_BACKOFF_RATIO", "0.7"))
+JUDGE_QUEUE_MAX = int(os.getenv("JUDGE_QUEUE_MAX", "64"))
+JUDGE_QUEUE_TIMEOUT = float(os.getenv("JUDGE_QUEUE_TIMEOUT", "300"))
+JUDGE_TOKENS_PER_SEC = float(os.getenv("JUDGE_TOKENS_PER_SEC", "0"))
+JUDGE_TOKEN_BUCKET_CAPACITY = float(os.getenv("JUDGE_TOKEN_BUCKET_CAPACITY", "20000"))
+
+# Judge model cascade: small model first, escalate to OLLAMA_MODEL on doubt (empty = disabled)
+JUDGE_CASCADE_MODEL = os.getenv("JUDGE_CASCADE_MODEL", "")
+JUDGE_CASCADE_MIN_CONFIDENCE = float(os.getenv("JUDGE_CASCADE_MIN_CONFIDENCE", "0.7"))
+JUDGE_CASCADE_BORDERLINE_LOW = float(os.getenv("JUDGE_CASCADE_BORDERLINE_LOW", "0.3"))
+JUDGE_CASCADE_BORDERLINE_HIGH = float(os.getenv("JUDGE_CASCADE_BORDERLINE_HIGH", "0.7"))
+# Fraction of small-model-accepted turns shadow-judged by OLLAMA_MODEL to measure false accepts
+JUDGE_CASCADE_AUDIT_RATE = float(os.getenv("JUDGE_CASCADE_AUDIT_RATE", "0.05"))
+
+# Near-duplicate response dedup (reuse judge verdicts for templated answers)
+JUDGE_DEDUP_ENABLED = os.getenv("JUDGE_DEDUP_ENABLED", "true").lower() == "true"
+JUDGE_DEDUP_MAX_HAMMING = int(os.getenv("JUDGE_DEDUP_MAX_HAMMING", "10"))
+JUDGE_DEDUP_MAX_ENTRIES = int(os.getenv("JUDGE_DEDUP_MAX_ENTRIES", "50000"))
+JUDGE_DEDUP_MAX_UNGROUNDED = int(os.getenv("JUDGE_DEDUP_MAX_UNGROUNDED", "3"))
+
+# Statistical sampling mode for batch runs
+SAMPLING_LENGTH_BUCKETS = tuple(int(x) for x in os.getenv("SAMPLING_LENGTH_BUCKETS", "4,10").split(","))
+SAMPLING_BOOTSTRAP_RESAMPLES = int(os.getenv("SAMPLING_BOOTSTRAP_RESAMPLES", "1000"))
+# Max batch-sampling judge calls in flight (kept well below JUDGE_QUEUE_MAX so batches don't shed themselves)
+SAMPLING_MAX_IN_FLIGHT = int(os.getenv("SAMPLING_MAX_IN_FLIGHT", str(max(1, JUDGE_QUEUE_MAX // 4))))
+SAMPLING_OVERLOAD_RETRIES = int(os.getenv("SAMPLING_OVERLOAD_RETRIES", "3"))
+
+# Chatbot cost per 1000 context tokens, per model as a JSON object (e.g. '{"gpt-4o": 0.005}')
+DEFAULT_PRICE_PER_1K_TOKENS = float(os.getenv("DEFAULT_PRICE_PER_1K_TOKENS", "0.0001"))
+MODEL_PRICING = json.loads(os.getenv("MODEL_PRICING", "{}"))
+
+# Dashboard result delivery (background batched publisher)
+FRONTEND_URL = os.getenv("FRONTEND_URL")
+FRONTEND_PUBLISH_QUEUE_MAX = int(os.getenv("FRONTEND_PUBLISH_QUEUE_MAX", "1000"))
+FRONTEND_PUBLISH_BATCH_SIZE = int(os.getenv("FRONTEND_PUBLISH_BATCH_SIZE", "50"))
+FRONTEND_PUBLISH_FLUSH_INTERVAL = float(os.getenv("FRONTEND_PUBLISH_FLUSH_INTERVAL", "0.5"))
+FRONTEND_PUBLISH_MAX_RETRIES = int(os.getenv("FRONTEND_PUBLISH_MAX_RETRIES", "5"))
+FRONTEND_PUBLISH_BACKOFF = float(os.getenv("FRONTEND_PUBLISH_BACKOFF", "0.5"))
+FRONTEND_PUBLISH_BACKOFF_MAX = float(os.getenv("FRONTEND_PUBLISH_BACKOFF_MAX", "30"))
+FRONTEND_PUBLISH_TIMEOUT = float(os.getenv("FRONTEND_PUBLISH_TIMEOUT", "10"))
+
+# Analytics store (in memory, per process, not persisted)
+ANALYTICS_MAX_ROWS = int(os.getenv("ANALYTICS_MAX_ROWS", "500000"))
+ANALYTICS_RETENTION_DAYS = int(os.getenv("ANALYTICS_RETENTION_DAYS", "0"))  # 0 = keep until evicted by ANALYTICS_MAX_ROWS
@@ -0,0 +1,42 @@
+from typing import Dict, List, Optional, Tuple
+from metrics import calculate_metrics_batch
+from models import ConversationInput, ConversationTurn
+
+
+def pair_turns(conversation: ConversationInput) -> Tuple[List[Tuple[ConversationTurn, ConversationTurn]], List[ConversationTurn]]:
+    """
+    Pair each AI turn with the User turn numbered immediately before it, in
+    one pass over the conversation. Returns (pairs, unpaired AI turns), both
+    in conversation order.
+    """
+    user_turns: Dict[int, ConversationTurn] = {}
+    ai_turns: List[ConversationTurn] = []
+    for turn in conversation.conversation_turns:
+        if turn.role == "User":
+            user_turns.setdefault(turn.turn, turn)
+        elif turn.role == "AI/Chatbot":
+            ai_turns.append(turn)
+
+    pairs = []
+    unpaired = []
+    for ai_turn in ai_turns:
+        user_turn = user_turns.get(ai_turn.turn - 1)
+        if user_turn is None:
+            unpaired.append(ai_turn)
+        else:
+            pairs.append((user_turn, ai_turn))
+    return pairs, unpaired
+
+
+class PreparedConversation:
+    """Turn pairs of a conversation with their latency/token/cost metrics precomputed"""
+
+    def __init__(self, conversation: ConversationInput, used_vectors: List[Dict], model: Optional[str] = None):
+        self.pairs, self.unpaired = pair_turns(conversation)
+        self.ai_turn_count = len(self.pairs) + len(self.unpaired)
+        self.metrics = calculate_metrics_batch(
+            [(user_turn.created_at, ai_turn.created_at) for user_turn, ai_turn in self.pairs],
+            used_vectors,
+            model
+        )
+        self.metrics_by_turn = {ai_turn.turn: m for (_, ai_turn), m in zip(self.pairs, self.metrics)}
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import config
+
+
+def hash_turn_pair(user_turn, ai_turn) -> str:
+    """Content hash of a (user, AI) turn pair; any edit forces re-evaluation"""
+    payload = json.dumps([
+        user_turn.message, user_turn.created_at,
+        ai_turn.message, ai_turn.created_at
+    ])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def hash_vector_set(vectors: List[Dict], model: Optional[str] = None) -> str:
+    """
+    Content hash of the vectors_used set and the chatbot model (which selects
+    the cost pricing); a change in either invalidates all turns
+    """
+    payload = json.dumps({"vectors": vectors, "model": model}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ConversationState:
+    """Evaluation state retained for a single chat_id between resubmissions"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.vector_key: Optional[str] = None
+        self.turn_hashes: Dict[int, str] = {}
+        self.evaluations: Dict[int, Dict] = {}
+        self._reset_totals()
+
+    def _reset_totals(self):
+        self.totals = {
+            "overall": 0.0,
+            "hallucinations": 0,
+            "llm_calls": 0,
+            "relevance": 0.0,
+            "completeness": 0.0,
+            "cost": 0.0,
+            "latency": 0.0
+        }
+
+    def reset(self, vector_key: str):
+        """Drop all prior evaluations (e.g. when the vector set changed)"""
+        self.vector_key = vector_key
+        self.turn_hashes = {}
+        self.evaluations = {}
+        self._reset_totals()
+
+    def is_current(self, turn: int, turn_hash: str) -> bool:
+        return self.turn_hashes.get(turn) == turn_hash
+
+    def _apply(self, evaluation: Dict, sign: int):
+        self.totals["overall"] += sign * evaluation.get("scores", {}).get("overall", 0)
+        self.totals["hallucinations"] += sign * int(bool(evaluation["llm_judgment"]["hallucination"]))
+        self.totals["llm_calls"] += sign * int(bool(evaluation["used_llm"]))
+        self.totals["relevance"] += sign * evaluation["llm_judgment"]["relevance_score"]
+        self.totals["completeness"] += sign * evaluation["llm_judgment"]["completeness_score"]
+        self.totals["cost"] += sign * evaluation["metrics"]["cost_usd"]
+        self.totals["latency"] += sign * evaluation["metrics"]["latency_ms"]
+
+    def put(self, turn: int, turn_hash: str, evaluation: Dict):
+        """Store a fresh evaluation, replacing the old one's contribution to the totals"""
+        self.drop(turn)
+        self.turn_hashes[turn] = turn_hash
+        self.evaluations[turn] = evaluation
+        self._apply(evaluation, +1)
+
+    def drop(self, turn: int):
+        old = self.evaluations.pop(turn, None)
+        self.turn_hashes.pop(turn, None)
+        if old is not None:
+            self._apply(old, -1)
+
+    def retain(self, turns: List[int]):
+        """Forget turns that are no longer part of the submitted conversation"""
+        keep = set(turns)
+        for turn in [t for t in self.evaluations if t not in keep]:
+            self.drop(turn)
+
+    def ordered_evaluations(self, turns: List[int]) -> List[Dict]:
+        return [self.evaluations[t] for t in turns if t in self.evaluations]
+
+    def overall_score(self) -> float:
+        """Same result as Evaluator.calculate_overall_score, from running totals"""
+        n = len(self.evaluations)
+        if not n:
+            return 0.0
+        return round((self.totals["overall"] / n) * 100, 2)
+
+    def summary(self) -> Dict:
+        n = len(self.evaluations)
+        return {
+            "total_evaluations": n,
+            "hallucinations_detected": self.totals["hallucinations"],
+            "llm_calls_made": self.totals["llm_calls"],
+            "cross_encoder_only": n - self.totals["llm_calls"],
+            "avg_relevance": round(self.totals["relevance"] / n, 2) if n else 0,
+            "avg_completeness": round(self.totals["completeness"] / n, 2) if n else 0,
+            "total_cost": round(self.totals["cost"], 6),
+            "avg_latency_ms": round(self.totals["latency"] / n, 2) if n else 0
+        }
+
+
+class ConversationStateStore:
+    """LRU-bounded map of chat_id -> ConversationState"""
+
+    def __init__(self, max_chats: int = None):
+        self.max_chats = max_chats if max_chats is not None else config.CONVERSATION_STATE_MAX_CHATS
+        self._states: "OrderedDict[int, ConversationState]" = OrderedDict()
+
+    def get(self, chat_id: int) -> ConversationState:
+        state = self._states.get(chat_id)
+        if state is None:
+            state = ConversationState()
+            self._states[chat_id] = state
+            while len(self._states) > self.max_chats:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(chat_id)
+        return state
+
+    def __len__(self) -> int:
+        return len(self._states)
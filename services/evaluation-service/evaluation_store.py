@@ -0,0 +1,257 @@
+import numpy as np
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence
+from dateutil import parser
+import config
+
+SEVERITY_CODES = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+SEVERITY_NAMES = {code: name for name, code in SEVERITY_CODES.items()}
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+METRIC_COLUMNS = ("relevance", "completeness", "hallucination", "overall", "latency_ms", "cost_usd", "tokens")
+KEY_COLUMNS = ("chat_id", "user_id", "turn", "day", "severity", "vector_id")
+GROUP_BY_COLUMNS = ("user_id", "chat_id", "day", "severity", "vector_id")
+ROLLUP_SUMS = ("relevance", "completeness", "hallucination", "overall", "latency_ms", "cost_usd")
+
+
+def to_day(timestamp: str) -> int:
+    """Days since 1970-01-01 for an ISO timestamp"""
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except ValueError:
+        parsed = parser.parse(timestamp)
+    return parsed.date().toordinal() - EPOCH_ORDINAL
+
+
+def from_day(day: int) -> str:
+    return date.fromordinal(int(day) + EPOCH_ORDINAL).isoformat()
+
+
+class EvaluationStore:
+    """
+    Columnar store of turn evaluations (one NumPy array per column, grown by
+    doubling). Rows are keyed by (chat_id, turn) so re-evaluated turns are
+    overwritten in place. Per-dimension rollups (count and sums) are updated
+    on every write, so grouped means are O(groups); percentiles and
+    histograms run as vectorized passes over the columns.
+
+    The store is per process and not persisted: history is lost on restart.
+    It keeps at most max_rows rows (least recently written evicted first)
+    and, if retention_days is set, drops rows whose day is older than that.
+    """
+
+    def __init__(self, capacity: int = 1024, max_rows: int = None, retention_days: int = None):
+        self.max_rows = config.ANALYTICS_MAX_ROWS if max_rows is None else max_rows
+        self.retention_days = config.ANALYTICS_RETENTION_DAYS if retention_days is None else retention_days
+        self.evicted = 0
+        self._pruned_on = None
+        self.size = 0
+        self.columns: Dict[str, np.ndarray] = {}
+        for name in METRIC_COLUMNS:
+            self.columns[name] = np.zeros(capacity, dtype=np.float64)
+        for name in KEY_COLUMNS:
+            self.columns[name] = np.zeros(capacity, dtype=np.int64)
+        self.rows: "OrderedDict[tuple, int]" = OrderedDict()
+        self.rollups: Dict[str, Dict[int, Dict[str, float]]] = {dim: {} for dim in GROUP_BY_COLUMNS}
+
+    def _grow(self):
+        capacity = len(self.columns["turn"]) * 2
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def _rollup(self, row: int, sign: int):
+        for dim in GROUP_BY_COLUMNS:
+            key = int(self.columns[dim][row])
+            totals = self.rollups[dim].setdefault(key, {"count": 0, **{name: 0.0 for name in ROLLUP_SUMS}})
+            totals["count"] += sign
+            for name in ROLLUP_SUMS:
+                totals[name] += sign * self.columns[name][row]
+            if totals["count"] == 0:
+                del self.rollups[dim][key]
+
+    def add(self, chat_id: int, user_id: int, evaluation: Dict, timestamp: str, severity: str):
+        """Insert or overwrite the row for (chat_id, turn)"""
+        judgment = evaluation["llm_judgment"]
+        metrics = evaluation["metrics"]
+        vector_ids = evaluation.get("vector_ids") or []
+        values = {
+            "relevance": judgment["relevance_score"],
+            "completeness": judgment["completeness_score"],
+            "hallucination": 1.0 if judgment["hallucination"] else 0.0,
+            "overall": evaluation.get("scores", {}).get("overall", 0) * 100,
+            "latency_ms": metrics["latency_ms"],
+            "cost_usd": metrics["cost_usd"],
+            "tokens": metrics["tokens_used"],
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "turn": evaluation["turn"],
+            "day": to_day(timestamp),
+            "severity": SEVERITY_CODES.get(severity, SEVERITY_CODES["medium"]),
+            "vector_id": vector_ids[0] if vector_ids else -1
+        }
+
+        key = (chat_id, evaluation["turn"])
+        if self.retention_days:
+            min_day = date.today().toordinal() - EPOCH_ORDINAL - self.retention_days
+            if self._pruned_on != min_day:
+                self._pruned_on = min_day
+                self.prune(min_day)
+            if values["day"] < min_day:
+                self.remove(*key)
+                return
+
+        row = self.rows.get(key)
+        if row is None:
+            while self.size >= self.max_rows:
+                self.remove(*next(iter(self.rows)))
+                self.evicted += 1
+            if self.size == len(self.columns["turn"]):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.rows[key] = row
+        else:
+            self._rollup(row, -1)
+            self.rows.move_to_end(key)
+
+        for name, value in values.items():
+            self.columns[name][row] = value
+        self._rollup(row, +1)
+
+    def remove(self, chat_id: int, turn: int):
+        """Drop the row for (chat_id, turn) if stored (e.g. its re-evaluation failed)"""
+        row = self.rows.pop((chat_id, turn), None)
+        if row is None:
+            return
+        self._rollup(row, -1)
+        # Keep rows contiguous: move the last row into the freed slot
+        last = self.size - 1
+        if row != last:
+            for column in self.columns.values():
+                column[row] = column[last]
+            self.rows[(int(self.columns["chat_id"][row]), int(self.columns["turn"][row]))] = row
+        self.size = last
+
+    def prune(self, min_day: int) -> int:
+        """Drop every row whose day is before min_day; returns the number dropped"""
+        n = self.size
+        keep = self.columns["day"][:n] >= min_day
+        dropped = int(n - keep.sum())
+        if not dropped:
+            return 0
+        for row in np.flatnonzero(~keep):
+            self._rollup(int(row), -1)
+        for name, column in self.columns.items():
+            column[:n - dropped] = column[:n][keep]
+        new_index = np.cumsum(keep) - 1
+        self.rows = OrderedDict((key, int(new_index[row])) for key, row in self.rows.items() if keep[row])
+        self.size = n - dropped
+        self.evicted += dropped
+        return dropped
+
+    def stats(self) -> Dict:
+        return {
+            "rows": self.size,
+            "max_rows": self.max_rows,
+            "retention_days": self.retention_days,
+            "evicted": self.evicted
+        }
+
+    @staticmethod
+    def decode_key(dim: str, key: int):
+        if dim == "day":
+            return from_day(key)
+        if dim == "severity":
+            return SEVERITY_NAMES.get(key, "medium")
+        if dim == "vector_id" and key == -1:
+            return None
+        return key
+
+    def rollup(self, group_by: str) -> List[Dict]:
+        """Incrementally maintained per-group aggregates"""
+        groups = []
+        for key, totals in sorted(self.rollups[group_by].items()):
+            count = totals["count"]
+            groups.append({
+                "key": self.decode_key(group_by, key),
+                "count": count,
+                "avg_relevance": round(totals["relevance"] / count, 4),
+                "avg_completeness": round(totals["completeness"] / count, 4),
+                "hallucination_rate": round(totals["hallucination"] / count, 4),
+                "avg_overall_score": round(totals["overall"] / count, 2),
+                "avg_latency_ms": round(totals["latency_ms"] / count, 2),
+                "total_cost": round(totals["cost_usd"], 6)
+            })
+        return groups
+
+    def _mask(self, filters: Dict[str, Optional[int]]) -> np.ndarray:
+        n = self.size
+        mask = np.ones(n, dtype=bool)
+        for dim in ("user_id", "chat_id", "vector_id", "severity"):
+            if filters.get(dim) is not None:
+                mask &= self.columns[dim][:n] == filters[dim]
+        if filters.get("day_from") is not None:
+            mask &= self.columns["day"][:n] >= filters["day_from"]
+        if filters.get("day_to") is not None:
+            mask &= self.columns["day"][:n] <= filters["day_to"]
+        return mask
+
+    def query(self, metric: str, group_by: Optional[str] = None, percentiles: Sequence[float] = (50, 90, 99),
+              bins: int = 10, filters: Optional[Dict[str, Optional[int]]] = None) -> Dict:
+        mask = self._mask(filters or {})
+        values = self.columns[metric][:self.size][mask]
+        result = {"metric": metric, "rows": int(values.size), "summary": self._describe(values, percentiles, bins)}
+        if group_by:
+            keys = self.columns[group_by][:self.size][mask]
+            result["group_by"] = group_by
+            result["groups"] = self._grouped(keys, values, group_by, percentiles)
+        return result
+
+    @staticmethod
+    def _describe(values: np.ndarray, percentiles: Sequence[float], bins: int) -> Dict:
+        if not values.size:
+            return {"count": 0}
+        counts, edges = np.histogram(values, bins=bins)
+        return {
+            "count": int(values.size),
+            "mean": round(float(values.mean()), 4),
+            "std": round(float(values.std()), 4),
+            "min": round(float(values.min()), 4),
+            "max": round(float(values.max()), 4),
+            "percentiles": {
+                f"p{p:g}": round(float(v), 4) for p, v in zip(percentiles, np.percentile(values, percentiles))
+            },
+            "histogram": {"edges": [round(float(e), 4) for e in edges], "counts": counts.tolist()}
+        }
+
+    def _grouped(self, keys: np.ndarray, values: np.ndarray, group_by: str, percentiles: Sequence[float]) -> List[Dict]:
+        if not values.size:
+            return []
+        # Sort by (group, value) once; every group is then a contiguous sorted run
+        order = np.lexsort((values, keys))
+        sorted_keys = keys[order]
+        sorted_values = values[order]
+        groups, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+        means = np.add.reduceat(sorted_values, starts) / counts
+
+        # Linear-interpolated percentiles for all groups at once
+        group_percentiles = {}
+        for p in percentiles:
+            position = starts + (counts - 1) * (p / 100)
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            fraction = position - low
+            group_percentiles[f"p{p:g}"] = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * fraction
+
+        return [
+            {
+                "key": self.decode_key(group_by, int(groups[i])),
+                "count": int(counts[i]),
+                "mean": round(float(means[i]), 4),
+                "percentiles": {name: round(float(column[i]), 4) for name, column in group_percentiles.items()}
+            }
+            for i in range(len(groups))
+        ]
@@ -1,9 +1,11 @@
 from llm_client import call_judge_llm
 from metrics import calculate_metrics
+from judge_dedup import ResponseDedupIndex
 from typing import Dict, List
 import re
 import httpx
 import os
+import config
 
 
 class Evaluator:
@@ -14,6 +16,7 @@ class Evaluator:
         self.SLA_MS = 10000
         self.MAX_COST = 0.001
         self.vector_encoder_url = os.getenv('VECTOR_ENCODER_URL', 'http://vector-encoder:8001')
+        self.dedup = ResponseDedupIndex() if config.JUDGE_DEDUP_ENABLED else None
         print("Evaluator initialized")
         
     async def evaluate_turn(
@@ -26,31 +29,46 @@ class Evaluator:
         all_vectors_for_cost: List[Dict],
         timestamp_user: str,
         timestamp_ai: str,
-        vector_ids: List[int] = None
+        vector_ids: List[int] = None,
+        priority: int = 0,
+        metrics: Dict = None
     ) -> Dict:
-        """Evaluate a single conversation turn"""
+        """Evaluate a single conversation turn (metrics may be precomputed by the caller)"""
         
         print(f"\n{'='*60}")
         print(f"Evaluating Turn {turn_number}")
         print(f"{'='*60}")
         
+        # Reuse the verdict of a near-duplicate response to the same question and context
+        llm_judgment = None
+        if self.dedup is not None:
+            llm_judgment = self.dedup.lookup(ai_response, vector_ids, context_vectors, user_query)
+            if llm_judgment is not None:
+                print(f"  Reusing judgment of near-duplicate response (distance {llm_judgment['dedup_distance']})")
+        
         # Call LLM Judge
-        print(f"Calling Judge LLM with vector IDs: {vector_ids}...")
-        llm_judgment = await call_judge_llm(
-            user_query=user_query,
-            ai_response=ai_response,
-            context_vectors=context_vectors,
-            vector_ids=vector_ids
-        )
-        print(f"  LLM Judgment received")
+        if llm_judgment is None:
+            print(f"Calling Judge LLM with vector IDs: {vector_ids}...")
+            llm_judgment = await call_judge_llm(
+                user_query=user_query,
+                ai_response=ai_response,
+                context_vectors=context_vectors,
+                vector_ids=vector_ids,
+                priority=priority
+            )
+            print(f"  LLM Judgment received")
+            if self.dedup is not None:
+                self.dedup.add(ai_response, vector_ids, context_vectors, llm_judgment, user_query)
         
         # Calculate metrics (use all vectors for cost calculation)
-        print("Calculating metrics...")
-        metrics_result = calculate_metrics(
-            timestamp_user=timestamp_user,
-            timestamp_ai=timestamp_ai,
-            context_vectors=all_vectors_for_cost
-        )
+        metrics_result = metrics
+        if metrics_result is None:
+            print("Calculating metrics...")
+            metrics_result = calculate_metrics(
+                timestamp_user=timestamp_user,
+                timestamp_ai=timestamp_ai,
+                context_vectors=all_vectors_for_cost
+            )
         
         # Apply new scoring strategy
         scores = await self._calculate_scores(
@@ -86,7 +104,8 @@ class Evaluator:
             "llm_judgment": llm_judgment,
             "metrics": metrics_result,
             "scores": scores,
-            "used_llm": True
+            "used_llm": llm_judgment.get("method") != "llm_judge_dedup",
+            "vector_ids": vector_ids or []
         }
         
         print(f"{'='*60}\n")
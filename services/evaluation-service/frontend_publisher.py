@@ -0,0 +1,129 @@
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+import httpx
+import config
+
+
+class FrontendPublisher:
+    """
+    Background delivery of serialized results to the dashboard.
+
+    publish() never waits: results go into a bounded in-memory queue (the
+    oldest queued result is evicted when it is full) and a single worker
+    task POSTs them in batches to the frontend's bulk endpoint over one
+    shared client, retrying failed batches with exponential backoff before
+    dropping them.
+    """
+
+    def __init__(self, frontend_url: str, max_queue: int = None, batch_size: int = None,
+                 flush_interval: float = None, max_retries: int = None, backoff: float = None):
+        self.url = f"{frontend_url.rstrip('/')}/api/results/bulk"
+        self.max_queue = config.FRONTEND_PUBLISH_QUEUE_MAX if max_queue is None else max_queue
+        self.batch_size = config.FRONTEND_PUBLISH_BATCH_SIZE if batch_size is None else batch_size
+        self.flush_interval = config.FRONTEND_PUBLISH_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_retries = config.FRONTEND_PUBLISH_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = config.FRONTEND_PUBLISH_BACKOFF if backoff is None else backoff
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=self.max_queue)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.delivered = 0
+        self.batches = 0
+        self.retries = 0
+        self.overflow = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self.last_delivery: Optional[float] = None
+
+    def start(self):
+        self._client = httpx.AsyncClient(timeout=config.FRONTEND_PUBLISH_TIMEOUT)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Deliver what is queued (bounded by drain_timeout), then close the client"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Frontend publisher: {self.queue.qsize()} results undelivered at shutdown")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self._client.aclose()
+        self._task = None
+
+    def publish(self, body: bytes):
+        """Queue one serialized result; returns immediately"""
+        self.published += 1
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.overflow += 1
+        self.queue.put_nowait(body)
+
+    async def _next_batch(self) -> List[bytes]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _deliver(self, batch: List[bytes]) -> bool:
+        # Results are already JSON; the bulk body is just their concatenation
+        content = b"[" + b",".join(batch) + b"]"
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._client.post(
+                    self.url, content=content, headers={"Content-Type": "application/json"}
+                )
+                response.raise_for_status()
+                return True
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if attempt == self.max_retries:
+                    break
+                self.retries += 1
+                delay = min(config.FRONTEND_PUBLISH_BACKOFF_MAX, self.backoff * (2 ** attempt))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        return False
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                if await self._deliver(batch):
+                    self.delivered += len(batch)
+                    self.batches += 1
+                    self.last_delivery = time.time()
+                else:
+                    self.dropped += len(batch)
+                    print(f"Frontend publisher: dropped {len(batch)} results ({self.last_error})")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "queued": self.queue.qsize(),
+            "queue_max": self.max_queue,
+            "published": self.published,
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "retries": self.retries,
+            "overflow": self.overflow,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+            "last_delivery": self.last_delivery
+        }
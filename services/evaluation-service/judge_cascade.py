@@ -0,0 +1,118 @@
+from typing import Dict, List
+import config
+
+
+def escalation_reasons(judgment: Dict) -> List[str]:
+    """Why a small-model verdict should be re-judged by the large model (empty = accept)"""
+    if judgment.get("method") == "llm_judge_error":
+        return ["error"]
+
+    reasons = []
+    if judgment.get("hallucination"):
+        reasons.append("hallucination")
+
+    confidence = judgment.get("confidence")
+    if not isinstance(confidence, (int, float)) or confidence < config.JUDGE_CASCADE_MIN_CONFIDENCE:
+        reasons.append("low_confidence")
+
+    for field in ("relevance_score", "completeness_score"):
+        score = judgment.get(field)
+        if not isinstance(score, (int, float)):
+            reasons.append(f"missing_{field}")
+        elif config.JUDGE_CASCADE_BORDERLINE_LOW <= score < config.JUDGE_CASCADE_BORDERLINE_HIGH:
+            reasons.append(f"borderline_{field}")
+    return reasons
+
+
+class Agreement:
+    """Small/large verdict agreement over turns judged by both models"""
+
+    def __init__(self):
+        self.compared = 0
+        self.hallucination_agree = 0
+        self.large_hallucination_only = 0
+        self.relevance_abs_diff = 0.0
+        self.completeness_abs_diff = 0.0
+
+    def record(self, small: Dict, large: Dict):
+        if "llm_judge_error" in (small.get("method"), large.get("method")):
+            return
+        self.compared += 1
+        if bool(small.get("hallucination")) == bool(large.get("hallucination")):
+            self.hallucination_agree += 1
+        elif large.get("hallucination"):
+            self.large_hallucination_only += 1
+        self.relevance_abs_diff += abs(_score(small, "relevance_score") - _score(large, "relevance_score"))
+        self.completeness_abs_diff += abs(_score(small, "completeness_score") - _score(large, "completeness_score"))
+
+    def snapshot(self) -> Dict:
+        n = self.compared
+        return {
+            "compared": n,
+            "hallucination_agreement": round(self.hallucination_agree / n, 4) if n else None,
+            "missed_hallucination_rate": round(self.large_hallucination_only / n, 4) if n else None,
+            "mean_relevance_abs_diff": round(self.relevance_abs_diff / n, 4) if n else None,
+            "mean_completeness_abs_diff": round(self.completeness_abs_diff / n, 4) if n else None
+        }
+
+
+class CascadeStats:
+    """
+    Per-tier counts and small/large agreement, for threshold tuning.
+
+    Agreement on escalated turns only covers verdicts the small model already
+    doubted; a random JUDGE_CASCADE_AUDIT_RATE fraction of accepted turns is
+    shadow-judged by the large model and reported separately, which measures
+    how often accepted verdicts are wrong (the false-accept rate).
+    """
+
+    def __init__(self):
+        self.small_accepted = 0
+        self.escalated = 0
+        self.large_only = 0
+        self.large_failed = 0
+        self.reasons: Dict[str, int] = {}
+        self.escalated_agreement = Agreement()
+        self.audited = 0
+        self.audit_shed = 0
+        self.audit_agreement = Agreement()
+
+    def record_escalation(self, reasons: List[str]):
+        self.escalated += 1
+        for reason in reasons:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def record_agreement(self, small: Dict, large: Dict):
+        self.escalated_agreement.record(small, large)
+
+    def record_audit(self, small: Dict, large: Dict):
+        self.audited += 1
+        self.audit_agreement.record(small, large)
+
+    def snapshot(self) -> Dict:
+        total = self.small_accepted + self.escalated + self.large_only
+        return {
+            "enabled": bool(config.JUDGE_CASCADE_MODEL),
+            "small_model": config.JUDGE_CASCADE_MODEL or None,
+            "large_model": config.OLLAMA_MODEL,
+            "turns": total,
+            "small_accepted": self.small_accepted,
+            "escalated": self.escalated,
+            "large_only": self.large_only,
+            "large_failed_used_small": self.large_failed,
+            "small_accept_rate": round(self.small_accepted / total, 4) if total else 0,
+            "escalation_reasons": dict(self.reasons),
+            "agreement": self.escalated_agreement.snapshot(),
+            "audit": {
+                "rate": config.JUDGE_CASCADE_AUDIT_RATE,
+                "audited": self.audited,
+                "shed": self.audit_shed,
+                # missed_hallucination_rate here is the false-accept rate of the small model
+                **self.audit_agreement.snapshot()
+            }
+        }
+
+
+def _score(judgment: Dict, field: str) -> float:
+    value = judgment.get(field)
+    return float(value) if isinstance(value, (int, float)) else 0.5
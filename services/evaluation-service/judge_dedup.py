@@ -0,0 +1,189 @@
+import copy
+import hashlib
+import itertools
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import config
+
+BIT_POSITIONS = np.arange(64, dtype=np.uint64)
+URL_RE = re.compile(r"https?://\S+|www\.\S+")
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with URLs removed"""
+    return TOKEN_RE.findall(URL_RE.sub(" ", text.lower()))
+
+
+def simhash(tokens: List[str], ngram: int = 3) -> int:
+    """64-bit SimHash over word n-gram shingles"""
+    if len(tokens) < ngram:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [" ".join(tokens[i:i+ngram]) for i in range(len(tokens) - ngram + 1)]
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles],
+        dtype=np.uint64
+    )
+    # Bit b of the fingerprint is set when more shingle hashes have b set than clear
+    ones = ((hashes[:, None] >> BIT_POSITIONS) & np.uint64(1)).sum(axis=0)
+    majority = (2 * ones > len(shingles))[::-1]
+    return int(np.packbits(majority).view(">u8")[0])
+
+
+def context_key(vector_ids: Optional[List[int]], context_vectors: List[str], user_query: str = "") -> str:
+    """
+    Judgments are only shared between responses to the same (normalized) question
+    judged against the same context. The context text is hashed even when ids are
+    present, so verdicts don't outlive a /corpus/upsert under the same id.
+    """
+    key = hashlib.sha1(",".join(str(v) for v in sorted(vector_ids or [])).encode("utf-8"))
+    for text in sorted(context_vectors):
+        key.update(b"\0" + text.encode("utf-8"))
+    key.update(b"\0" + " ".join(tokenize(user_query)).encode("utf-8"))
+    return key.hexdigest()
+
+
+class ResponseDedupIndex:
+    """
+    Locality-sensitive index of judged responses keyed by (SimHash, question, context).
+
+    Candidates are found by multi-index hashing: the 64-bit SimHash is split
+    into `blocks` blocks, each with its own table. By pigeonhole, a response
+    within max_hamming bits matches at least one block within
+    max_hamming // blocks bits, so a lookup probes every block value within
+    that radius. With 16-bit blocks a probe bucket holds ~N/65536 entries,
+    so candidate scans stay small as the index grows.
+
+    A near-duplicate is then lightly re-verified: words it has that the
+    matched response lacks must appear in the context, except for up to
+    max_ungrounded non-numeric words (names, greetings). Numbers must
+    always be grounded since they are usually prices, dates or counts.
+    """
+
+    def __init__(self, max_hamming: int = None, max_entries: int = None, max_ungrounded: int = None,
+                 blocks: int = 4):
+        self.max_hamming = config.JUDGE_DEDUP_MAX_HAMMING if max_hamming is None else max_hamming
+        self.max_entries = config.JUDGE_DEDUP_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_ungrounded = config.JUDGE_DEDUP_MAX_UNGROUNDED if max_ungrounded is None else max_ungrounded
+        if 64 % blocks:
+            raise ValueError("blocks must divide 64")
+        self.blocks = blocks
+        self.block_bits = 64 // blocks
+        radius = self.max_hamming // blocks
+        # Every block-width mask with at most `radius` bits set (137 masks for 16 bits, radius 2)
+        self.probe_masks = [0]
+        for r in range(1, radius + 1):
+            self.probe_masks.extend(
+                sum(1 << bit for bit in bits) for bits in itertools.combinations(range(self.block_bits), r)
+            )
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._tables: Dict[tuple, set] = {}
+        self._ids = itertools.count()
+        self.lookups = 0
+        self.hits = 0
+        self.reverify_rejects = 0
+
+    def _block_values(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.block_bits) - 1
+        return [(fingerprint >> (block * self.block_bits)) & mask for block in range(self.blocks)]
+
+    def _band_keys(self, fingerprint: int, ctx: str):
+        return [(ctx, block, value) for block, value in enumerate(self._block_values(fingerprint))]
+
+    def _probe_keys(self, fingerprint: int, ctx: str):
+        for block, value in enumerate(self._block_values(fingerprint)):
+            for flip in self.probe_masks:
+                yield (ctx, block, value ^ flip)
+
+    def _grounded(self, tokens: List[str], matched_tokens: set, context_vectors: List[str]) -> bool:
+        context_tokens = set(tokenize(" ".join(context_vectors)))
+        ungrounded = 0
+        for token in set(tokens) - matched_tokens:
+            if token in context_tokens:
+                continue
+            if any(ch.isdigit() for ch in token):
+                return False
+            ungrounded += 1
+            if ungrounded > self.max_ungrounded:
+                return False
+        return True
+
+    def lookup(self, ai_response: str, vector_ids: Optional[List[int]], context_vectors: List[str],
+               user_query: str = "") -> Optional[Dict]:
+        """Copy of a reusable judgment for a near-duplicate response, or None"""
+        self.lookups += 1
+        tokens = tokenize(ai_response)
+        if not tokens:
+            return None
+        ctx = context_key(vector_ids, context_vectors, user_query)
+        fingerprint = simhash(tokens)
+
+        candidates = set()
+        for key in self._probe_keys(fingerprint, ctx):
+            bucket = self._tables.get(key)
+            if bucket:
+                candidates.update(bucket)
+
+        best = None
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            distance = bin(fingerprint ^ entry["fingerprint"]).count("1")
+            if distance <= self.max_hamming and (best is None or distance < best[0]):
+                best = (distance, entry_id)
+        if best is None:
+            return None
+
+        entry = self._entries[best[1]]
+        if not self._grounded(tokens, entry["tokens"], context_vectors):
+            self.reverify_rejects += 1
+            return None
+
+        self._entries.move_to_end(best[1])
+        self.hits += 1
+        judgment = copy.deepcopy(entry["judgment"])
+        judgment["method"] = "llm_judge_dedup"
+        judgment["dedup_distance"] = best[0]
+        return judgment
+
+    def add(self, ai_response: str, vector_ids: Optional[List[int]], context_vectors: List[str], judgment: Dict,
+            user_query: str = ""):
+        if judgment.get("method") == "llm_judge_error":
+            return
+        tokens = tokenize(ai_response)
+        if not tokens:
+            return
+        ctx = context_key(vector_ids, context_vectors, user_query)
+        fingerprint = simhash(tokens)
+        keys = self._band_keys(fingerprint, ctx)
+
+        entry_id = next(self._ids)
+        self._entries[entry_id] = {
+            "fingerprint": fingerprint,
+            "keys": keys,
+            "tokens": set(tokens),
+            "judgment": copy.deepcopy(judgment)
+        }
+        for key in keys:
+            self._tables.setdefault(key, set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            old_id, old = self._entries.popitem(last=False)
+            for key in old["keys"]:
+                bucket = self._tables.get(key)
+                if bucket is not None:
+                    bucket.discard(old_id)
+                    if not bucket:
+                        del self._tables[key]
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "reverify_rejects": self.reverify_rejects,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0
+        }
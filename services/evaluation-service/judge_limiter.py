@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+import config
+
+
+class JudgeOverloaded(Exception):
+    """Raised when a judge call is shed instead of queued; maps to HTTP 429"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for judge calls driven by observed latency.
+
+    The baseline tracks the best recent latency per key (e.g. per judge
+    model; snaps down, drifts up slowly). A call that fails or takes longer
+    than baseline * tolerance shrinks the limit multiplicatively; otherwise
+    it grows by 1/limit, so the limit settles near the judge's knee instead
+    of filling its queue.
+    Callers beyond the limit wait in a priority queue (higher first). When
+    the queue is full, the lowest-priority waiter is shed in favour of a
+    higher-priority caller, so batch work can't 429 interactive requests.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int, latency_tolerance: float,
+                 backoff: float, queue_max: int, queue_timeout: float):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.baselines: Dict[str, float] = {}
+        self.shed = 0
+        self.errors = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _grant(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    async def acquire(self, priority: int = 0):
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.queue_max:
+            # Shed the lowest-priority (newest among equals) waiter, unless that is this caller
+            victim = max(self._waiters) if self._waiters else None
+            self.shed += 1
+            if victim is None or -victim[0] >= priority:
+                raise JudgeOverloaded("Judge queue full", self.queue_timeout)
+            self._waiters.remove(victim)
+            heapq.heapify(self._waiters)
+            if not victim[2].done():
+                victim[2].set_exception(
+                    JudgeOverloaded("Judge queue full (displaced by higher priority)", self.queue_timeout)
+                )
+
+        entry = (-priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(entry[2], self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            future = entry[2]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Granted just as we gave up: hand the slot to the next waiter
+                self.in_flight -= 1
+                self._grant()
+            elif entry in self._waiters:
+                # _grant may already have popped it while wait_for was cancelling the future
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.shed += 1
+            raise JudgeOverloaded("Timed out waiting for a judge slot", self.queue_timeout)
+
+    def release(self, latency_ms: float, ok: bool = None, key: str = ""):
+        """Free a slot; ok=None (e.g. caller cancelled) leaves the limit unchanged"""
+        self.in_flight -= 1
+        if ok is None:
+            pass
+        elif not ok:
+            self.errors += 1
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            baseline = self.baselines.get(key)
+            if baseline is None or latency_ms < baseline:
+                baseline = latency_ms
+            else:
+                baseline += (latency_ms - baseline) * 0.01
+            self.baselines[key] = baseline
+            if latency_ms > baseline * self.latency_tolerance:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._grant()
+
+
+class TokenBucket:
+    """Admission by estimated prompt tokens; rate <= 0 disables the bucket"""
+
+    def __init__(self, rate: float, capacity: float, max_wait: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.shed = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def admit(self, tokens: float) -> float:
+        """Reserve tokens, waiting for the refill if needed; returns the amount reserved"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        tokens = min(tokens, self.capacity)
+        wait = max(0.0, (tokens - self.tokens) / self.rate)
+        if wait > self.max_wait:
+            self.shed += 1
+            raise JudgeOverloaded("Judge token budget exhausted", wait)
+        # Reserve now (possibly going into debt) so later callers queue behind us
+        self.tokens -= tokens
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund(tokens)
+                raise
+        return tokens
+
+    def refund(self, tokens: float):
+        """Return a reservation for a call that never reached the judge"""
+        if tokens:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class JudgeAdmission:
+    """Token-bucket admission followed by the adaptive concurrency limit"""
+
+    def __init__(self):
+        self.limiter = AdaptiveLimiter(
+            initial=config.JUDGE_CONCURRENCY_INITIAL,
+            min_limit=config.JUDGE_CONCURRENCY_MIN,
+            max_limit=config.JUDGE_CONCURRENCY_MAX,
+            latency_tolerance=config.JUDGE_LATENCY_TOLERANCE,
+            backoff=config.JUDGE_BACKOFF_RATIO,
+            queue_max=config.JUDGE_QUEUE_MAX,
+            queue_timeout=config.JUDGE_QUEUE_TIMEOUT
+        )
+        self.bucket = TokenBucket(
+            rate=config.JUDGE_TOKENS_PER_SEC,
+            capacity=config.JUDGE_TOKEN_BUCKET_CAPACITY,
+            max_wait=config.JUDGE_QUEUE_TIMEOUT
+        )
+
+    @asynccontextmanager
+    async def admit(self, estimated_tokens: int, priority: int = 0, key: str = ""):
+        reserved = await self.bucket.admit(estimated_tokens)
+        try:
+            await self.limiter.acquire(priority)
+        except (JudgeOverloaded, asyncio.CancelledError):
+            # Shed or cancelled while queued for a slot: the judge never saw these tokens
+            self.bucket.refund(reserved)
+            raise
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        except asyncio.CancelledError:
+            ok = None
+            raise
+        finally:
+            self.limiter.release((time.monotonic() - start) * 1000, ok, key)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "queued": len(self.limiter._waiters),
+            "baseline_latency_ms": {k: round(v, 2) for k, v in self.limiter.baselines.items()},
+            "shed_queue": self.limiter.shed,
+            "shed_tokens": self.bucket.shed,
+            "errors": self.limiter.errors
+        }
+
+
+def estimate_prompt_tokens(prompt: str, num_predict: int) -> int:
+    """Rough token estimate (~4 chars/token) plus the generation budget"""
+    return len(prompt) // 4 + num_predict
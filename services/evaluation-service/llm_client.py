@@ -1,7 +1,19 @@
+import asyncio
 import httpx
 import json
+import random
 from typing import Dict, List
 import config
+from judge_limiter import JudgeAdmission, JudgeOverloaded, estimate_prompt_tokens
+from judge_cascade import CascadeStats, escalation_reasons
+
+# Shared admission gate in front of config.JUDGE_LLM_URL
+judge_gate = JudgeAdmission()
+cascade_stats = CascadeStats()
+# Background shadow audits, referenced until done so they aren't garbage collected
+_audit_tasks = set()
+
+JUDGE_NUM_PREDICT = 150
 
 
 async def call_judge_llm(
@@ -9,17 +21,89 @@ async def call_judge_llm(
     ai_response: str,
     context_vectors: List[str],
     vector_ids: List[int] = None,
+    priority: int = 0,
 ) -> Dict:
     """
-    Call Ollama Judge LLM for detailed evaluation
+    Call Ollama Judge LLM for detailed evaluation.
+    
+    With JUDGE_CASCADE_MODEL set, the small model judges first and only
+    turns it flags (hallucination, low confidence, borderline scores,
+    errors) are escalated to config.OLLAMA_MODEL. A JUDGE_CASCADE_AUDIT_RATE
+    fraction of accepted turns is also shadow-judged by the large model in
+    the background, for the false-accept rate in cascade_stats.
+    Calls pass through judge_gate; raises JudgeOverloaded when shed.
     """
     
     # Merge all context vectors into single paragraph
     context_str = " ".join(context_vectors)
     vector_ids_str = str(vector_ids) if vector_ids else "[unknown]"
     
+    # Debug logging
+    if "legal" in ai_response.lower() or "subsidized" in ai_response.lower():
+        print(f"\n{'='*80}")
+        print(f"DEBUG: AI response contains 'legal' or 'subsidized'")
+        print(f"Vector IDs: {vector_ids_str}")
+        print(f"Context length: {len(context_str)} chars")
+        print(f"Context contains 'legal': {'legal' in context_str.lower()}")
+        print(f"Context contains 'contract': {'contract' in context_str.lower()}")
+        print(f"Context contains 'subsidized': {'subsidized' in context_str.lower()}")
+        print(f"{'='*80}\n")
+    
+    large_prompt = _build_prompt(user_query, ai_response, context_str, vector_ids_str)
+    
+    if not config.JUDGE_CASCADE_MODEL:
+        cascade_stats.large_only += 1
+        return await _judge_with_model(config.OLLAMA_MODEL, large_prompt, ai_response, priority)
+    
+    small_prompt = _build_prompt(user_query, ai_response, context_str, vector_ids_str, with_confidence=True)
+    small = await _judge_with_model(config.JUDGE_CASCADE_MODEL, small_prompt, ai_response, priority)
+    reasons = escalation_reasons(small)
+    if not reasons:
+        cascade_stats.small_accepted += 1
+        small["judge_tier"] = "small"
+        if random.random() < config.JUDGE_CASCADE_AUDIT_RATE:
+            _start_audit(small, large_prompt, ai_response, priority)
+        return small
+    
+    print(f"  Escalating to {config.OLLAMA_MODEL}: {', '.join(reasons)}")
+    cascade_stats.record_escalation(reasons)
+    large = await _judge_with_model(config.OLLAMA_MODEL, large_prompt, ai_response, priority)
+    cascade_stats.record_agreement(small, large)
+    
+    if large.get("method") == "llm_judge_error" and small.get("method") != "llm_judge_error":
+        cascade_stats.large_failed += 1
+        small["judge_tier"] = "small_fallback"
+        return small
+    
+    large["judge_tier"] = "large"
+    large["escalation_reasons"] = reasons
+    return large
+
+
+def _start_audit(small: Dict, prompt: str, ai_response: str, priority: int):
+    """Shadow-judge an accepted turn with the large model without delaying the response"""
+    # One below the turn's priority, so audits are shed before real judge calls
+    task = asyncio.create_task(_audit(dict(small), prompt, ai_response, priority - 1))
+    _audit_tasks.add(task)
+    task.add_done_callback(_audit_tasks.discard)
+
+
+async def _audit(small: Dict, prompt: str, ai_response: str, priority: int):
+    try:
+        large = await _judge_with_model(config.OLLAMA_MODEL, prompt, ai_response, priority)
+    except JudgeOverloaded:
+        cascade_stats.audit_shed += 1
+        return
+    cascade_stats.record_audit(small, large)
+
+
+def _build_prompt(user_query: str, ai_response: str, context_str: str, vector_ids_str: str,
+                  with_confidence: bool = False) -> str:
+    """Judge prompt; the cascade's small tier also reports its own confidence"""
+    confidence_field = ', "confidence": 0.0-1.0' if with_confidence else ""
+    
     # Build prompt with clear structure and vector IDs for debugging
-    prompt = f"""USER QUERY:
+    return f"""USER QUERY:
 {user_query}
 
 CONTEXT (Vector IDs: {vector_ids_str}):
@@ -31,93 +115,90 @@ AI RESPONSE:
 QUESTION: Is there any information stated in the AI response that is NOT present in the context above? If yes, mark it as a hallucination.
 
 Return JSON:
-{{"hallucination": true/false, "hallucinated_claims": ["specific information not in context"], "relevance_score": 0.0-1.0, "completeness_score": 0.0-1.0, "missing_info": [], "context_vector_ids_used": {vector_ids_str}}}
+{{"hallucination": true/false, "hallucinated_claims": ["specific information not in context"], "relevance_score": 0.0-1.0, "completeness_score": 0.0-1.0, "missing_info": [], "context_vector_ids_used": {vector_ids_str}{confidence_field}}}
 """
-    
-    # Debug logging
-    if "legal" in ai_response.lower() or "subsidized" in ai_response.lower():
-        print(f"\n{'='*80}")
-        print(f"DEBUG: AI response contains 'legal' or 'subsidized'")
-        print(f"Vector IDs: {vector_ids_str}")
-        print(f"Context length: {len(context_str)} chars")
-        print(f"Context contains 'legal': {'legal' in context_str.lower()}")
-        print(f"Context contains 'contract': {'contract' in context_str.lower()}")
-        print(f"Context contains 'subsidized': {'subsidized' in context_str.lower()}")
-        print(f"{'='*80}\n")
 
+
+async def _judge_with_model(model: str, prompt: str, ai_response: str, priority: int = 0) -> Dict:
+    """Single judge call against one Ollama model"""
     try:
-        timeout = httpx.Timeout(7200.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                f"{config.JUDGE_LLM_URL}/api/generate",
-                json={
-                    "model": config.OLLAMA_MODEL,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json",
-                    "options": {
-                        "num_predict": 150,
-                        "temperature": 0.1,
-                        "num_ctx": 4096,
-                        "num_thread": 8,
-                        "num_batch": 512,
-                        "top_k": 10,
-                        "top_p": 0.9,
-                        "repeat_penalty": 1.1
+        timeout = httpx.Timeout(float(config.OLLAMA_TIMEOUT), connect=10.0)
+        async with judge_gate.admit(estimate_prompt_tokens(prompt, JUDGE_NUM_PREDICT), priority, key=model):
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.post(
+                    f"{config.JUDGE_LLM_URL}/api/generate",
+                    json={
+                        "model": model,
+                        "prompt": prompt,
+                        "stream": False,
+                        "format": "json",
+                        "options": {
+                            "num_predict": JUDGE_NUM_PREDICT,
+                            "temperature": 0.1,
+                            "num_ctx": 4096,
+                            "num_thread": 8,
+                            "num_batch": 512,
+                            "top_k": 10,
+                            "top_p": 0.9,
+                            "repeat_penalty": 1.1
+                        }
                     }
-                }
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            llm_output = result.get("response", "{}")
-            
-            # Parse JSON response
-            try:
-                judgment = json.loads(llm_output)
-                
-                # Ensure required fields exist
-                if "hallucinated_claims" not in judgment:
-                    judgment["hallucinated_claims"] = []
-                if "missing_info" not in judgment:
-                    judgment["missing_info"] = []
-                
-                # Normalize hallucinated_claims to list of strings
-                claims = judgment["hallucinated_claims"]
-                if isinstance(claims, list):
-                    judgment["hallucinated_claims"] = [
-                        str(c) if not isinstance(c, str) else c 
-                        for c in claims
-                    ]
-                
-                # Normalize missing_info to list of strings
-                info = judgment["missing_info"]
-                if isinstance(info, list):
-                    judgment["missing_info"] = [
-                        str(i) if not isinstance(i, str) else i 
-                        for i in info
-                    ]
-                        
-            except json.JSONDecodeError:
-                # Fallback if LLM doesn't return valid JSON
-                judgment = {
-                    "hallucination": False,
-                    "hallucinated_claims": [],
-                    "relevance_score": 0.5,
-                    "completeness_score": 0.5,
-                    "missing_info": []
-                }
+                )
+                response.raise_for_status()
+        
+        result = response.json()
+        llm_output = result.get("response", "{}")
+        
+        # Parse JSON response
+        try:
+            judgment = json.loads(llm_output)
             
-            judgment["method"] = "llm_judge"
+            # Ensure required fields exist
+            if "hallucinated_claims" not in judgment:
+                judgment["hallucinated_claims"] = []
+            if "missing_info" not in judgment:
+                judgment["missing_info"] = []
             
-            # Debug logging for legal contracts and subsidized rooms
-            if "legal" in ai_response.lower() or "subsidized" in ai_response.lower():
-                print(f"\nDEBUG LLM Response:")
-                print(f"  Hallucination detected: {judgment.get('hallucination')}")
-                print(f"  Claims: {judgment.get('hallucinated_claims')}\n")
-            
-            return judgment
+            # Normalize hallucinated_claims to list of strings
+            claims = judgment["hallucinated_claims"]
+            if isinstance(claims, list):
+                judgment["hallucinated_claims"] = [
+                    str(c) if not isinstance(c, str) else c 
+                    for c in claims
+                ]
             
+            # Normalize missing_info to list of strings
+            info = judgment["missing_info"]
+            if isinstance(info, list):
+                judgment["missing_info"] = [
+                    str(i) if not isinstance(i, str) else i 
+                    for i in info
+                ]
+                    
+        except json.JSONDecodeError:
+            # Fallback if LLM doesn't return valid JSON
+            judgment = {
+                "hallucination": False,
+                "hallucinated_claims": [],
+                "relevance_score": 0.5,
+                "completeness_score": 0.5,
+                "missing_info": []
+            }
+        
+        judgment["method"] = "llm_judge"
+        judgment["judge_model"] = model
+        
+        # Debug logging for legal contracts and subsidized rooms
+        if "legal" in ai_response.lower() or "subsidized" in ai_response.lower():
+            print(f"\nDEBUG LLM Response:")
+            print(f"  Hallucination detected: {judgment.get('hallucination')}")
+            print(f"  Claims: {judgment.get('hallucinated_claims')}\n")
+        
+        return judgment
+    
+    except JudgeOverloaded:
+        # Shed by admission control; surfaced to the caller as 429
+        raise
     except Exception as e:
         print(f"Error calling Judge LLM: {e}")
         # Return safe default
@@ -128,5 +209,6 @@ Return JSON:
             "completeness_score": 0.5,
             "missing_info": [],
             "method": "llm_judge_error",
+            "judge_model": model,
             "error": str(e)
         }
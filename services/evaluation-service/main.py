@@ -1,24 +1,51 @@
-from fastapi import FastAPI, HTTPException
-from models import EvaluationRequest, EvaluationResult, ConversationInput, ContextVectorsInput
+from fastapi import FastAPI, HTTPException, Query, Response
+from models import (
+    EvaluationRequest, EvaluationResult, ConversationInput, ContextVectorsInput, ConversationTurn,
+    BatchEvaluationRequest, BatchEvaluationResult
+)
 from evaluator import Evaluator
-from vector_client import VectorClient
-import httpx
-import os
+from vector_client import VectorClient, VectorServiceUnavailable
+from conversation_preprocessor import PreparedConversation, pair_turns
+from conversation_state import ConversationStateStore, hash_turn_pair, hash_vector_set
+from judge_limiter import JudgeOverloaded
+from llm_client import judge_gate, cascade_stats
+from sampling import (
+    BINARY_METRICS, METRICS, StratifiedSampler, ready_to_stop, severity_label, stratified_estimate, stratum_key
+)
+from frontend_publisher import FrontendPublisher
+from serialization import TURN_FIELDS, dumps, parse_fields, result_payload, turn_payload
+from evaluation_store import EvaluationStore, GROUP_BY_COLUMNS, METRIC_COLUMNS, SEVERITY_CODES, to_day
+import config
+from typing import Dict, List, Optional, Sequence
+import asyncio
 
 app = FastAPI(title="LLM Evaluation Service", version="1.0.0")
 
 # Initialize evaluator and vector client at startup
 evaluator = None
 vector_client = None
+conversation_states = None
+evaluation_store = None
+frontend_publisher = None
 
 @app.on_event("startup")
 async def startup_event():
-    global evaluator, vector_client
+    global evaluator, vector_client, conversation_states, evaluation_store, frontend_publisher
     print("Starting Evaluation Service...")
     evaluator = Evaluator()
     vector_client = VectorClient()
+    conversation_states = ConversationStateStore()
+    evaluation_store = EvaluationStore()
+    if config.FRONTEND_URL:
+        frontend_publisher = FrontendPublisher(config.FRONTEND_URL)
+        frontend_publisher.start()
     print("Evaluation Service ready!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if frontend_publisher is not None:
+        await frontend_publisher.stop()
+
 
 
 
@@ -35,159 +62,144 @@ async def ready():
     return {"status": "ready"}
 
 
-@app.post("/api/evaluate", response_model=EvaluationResult)
-async def evaluate(request: EvaluationRequest):
-    """Main evaluation endpoint - accepts conversation and context vectors"""
-    return await process_evaluation(request.conversation, request.context_vectors)
+@app.get("/api/judge/stats")
+async def judge_stats():
+    """Judge admission control state, model cascade tier/agreement counts and dedup hit rate"""
+    stats = judge_gate.stats()
+    stats["cascade"] = cascade_stats.snapshot()
+    stats["dedup"] = evaluator.dedup.stats() if evaluator and evaluator.dedup else {"enabled": False}
+    return stats
+
+
+@app.get("/api/frontend/stats")
+async def frontend_stats():
+    """Dashboard publisher queue depth and delivery/retry/overflow/drop counters"""
+    if frontend_publisher is None:
+        return {"enabled": False}
+    return {"enabled": True, **frontend_publisher.stats()}
 
-async def process_evaluation(conversation: ConversationInput, context_vectors: ContextVectorsInput):
+
+@app.post(
+    "/api/evaluate",
+    response_class=Response,
+    responses={200: {
+        "model": EvaluationResult,
+        "description": "EvaluationResult. With compact=true each evaluation keeps only turn, scores, "
+                       "metrics, used_llm and vector_ids; with fields=... only the listed per-turn "
+                       "fields (plus turn)."
+    }}
+)
+async def evaluate(request: EvaluationRequest, priority: int = 0, compact: bool = False, fields: Optional[str] = None):
+    """
+    Main evaluation endpoint - accepts conversation and context vectors.
+    compact=true drops the echoed user/AI texts and raw judgments from each
+    turn; fields=turn,scores,... selects per-turn fields explicitly.
+    """
+    try:
+        turn_fields = parse_fields(fields, compact)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await process_evaluation(request.conversation, request.context_vectors, priority, turn_fields)
+
+async def process_evaluation(conversation: ConversationInput, context_vectors: ContextVectorsInput,
+                             priority: int = 0, turn_fields: Sequence[str] = TURN_FIELDS) -> Response:
     """
     Main evaluation endpoint
-    Accepts conversation and context vectors as separate payloads
+    Accepts conversation and context vectors as separate payloads.
+    Judge calls are queued by priority (higher first); if the judge is
+    overloaded the request fails with 429 and evaluated turns are kept
+    for the retry.
+    The result is serialized once with orjson; the full-result bytes are
+    both queued for the frontend and returned unless turn_fields projects
+    the response.
     """
-    request = EvaluationRequest(conversation=conversation, context_vectors=context_vectors)
-    
     print("\n" + "="*80)
     print("NEW EVALUATION REQUEST")
     print("="*80)
-    print(f"Conversation ID: {request.conversation.chat_id}")
-    print(f"User ID: {request.conversation.user_id}")
-    print(f"Total Turns: {len(request.conversation.conversation_turns)}")
+    print(f"Conversation ID: {conversation.chat_id}")
+    print(f"User ID: {conversation.user_id}")
+    print(f"Total Turns: {len(conversation.conversation_turns)}")
     
     try:
-        # Extract ONLY vectors_used IDs for evaluation
-        vectors_used_ids = request.context_vectors.data.get("sources", {}).get("vectors_used", [])
+        used_vectors = await resolve_used_vectors(context_vectors)
         
-        if vectors_used_ids:
-            # Get only the vectors that were actually used by RAG
-            vector_data = request.context_vectors.data.get("vector_data", [])
-            vector_id_map = {vec.get("id"): vec for vec in vector_data}
-            used_vectors = [vector_id_map[vid] for vid in vectors_used_ids if vid in vector_id_map]
-            print(f"Found {len(used_vectors)} vectors from vectors_used {vectors_used_ids}")
-        else:
-            used_vectors = []
-            print(f"Warning: No vectors_used specified, using empty context")
-        
-        # Extract AI responses from conversation
-        ai_turns = [
-            turn for turn in request.conversation.conversation_turns 
-            if turn.role == "AI/Chatbot"
-        ]
+        # Pair AI responses with their user queries and compute metrics for all turns in one pass
+        prepared = PreparedConversation(conversation, used_vectors, conversation.model)
         
-        print(f"AI Responses to Evaluate: {len(ai_turns)}")
+        print(f"AI Responses to Evaluate: {prepared.ai_turn_count}")
+        for ai_turn in prepared.unpaired:
+            print(f"Warning: No user query found for turn {ai_turn.turn}")
         
-        # Evaluate each AI response sequentially
-        evaluations = []
-        for ai_turn in ai_turns:
-            # Find corresponding user query (previous turn)
-            user_turn = None
-            for turn in request.conversation.conversation_turns:
-                if turn.turn == ai_turn.turn - 1 and turn.role == "User":
-                    user_turn = turn
-                    break
+        # Reuse prior evaluations for this chat_id; only new or edited turns are judged
+        state = conversation_states.get(conversation.chat_id)
+        async with state.lock:
+            vector_key = hash_vector_set(used_vectors, conversation.model)
+            if state.vector_key != vector_key:
+                state.reset(vector_key)
             
-            if user_turn is None:
-                print(f"Warning: No user query found for turn {ai_turn.turn}")
-                continue
+            evaluated_turns = []
+            reused = 0
+            for (user_turn, ai_turn), metrics in zip(prepared.pairs, prepared.metrics):
+                evaluated_turns.append(ai_turn.turn)
+                turn_hash = hash_turn_pair(user_turn, ai_turn)
+                if state.is_current(ai_turn.turn, turn_hash):
+                    reused += 1
+                    continue
+                
+                print(f"Processing turn {ai_turn.turn} sequentially...")
+                evaluation = await evaluate_turn_pair(user_turn, ai_turn, used_vectors, priority, metrics)
+                
+                # Judge failures are kept for this response but retried on the next resubmission,
+                # and stay out of analytics (their scores are placeholders)
+                if evaluation["llm_judgment"].get("method") == "llm_judge_error":
+                    turn_hash = None
+                    evaluation_store.remove(conversation.chat_id, ai_turn.turn)
+                else:
+                    record_evaluation(conversation, user_turn, ai_turn, evaluation)
+                state.put(ai_turn.turn, turn_hash, evaluation)
             
-            print(f"Processing turn {ai_turn.turn} sequentially...")
+            state.retain(evaluated_turns)
+            if reused:
+                print(f"Reused {reused} prior turn evaluations for chat {conversation.chat_id}")
             
-            # Select most relevant vector using MaxSim
-            if used_vectors:
-                most_relevant_vector = await vector_client.select_most_relevant_vector(
-                    user_turn.message, used_vectors
-                )
-                context_texts = [most_relevant_vector.get("text", "")] if most_relevant_vector else []
-                selected_vector_ids = [most_relevant_vector.get("id")] if most_relevant_vector else []
-                selected_vectors = [most_relevant_vector] if most_relevant_vector else []
-                print(f"Selected most relevant vector: ID {selected_vector_ids[0] if selected_vector_ids else 'None'}")
-            else:
-                context_texts = []
-                selected_vector_ids = []
-                selected_vectors = []
+            evaluations = state.ordered_evaluations(evaluated_turns)
             
-            # Process one at a time
-            evaluation = await evaluator.evaluate_turn(
-                turn_number=ai_turn.turn,
-                user_query=user_turn.message,
-                ai_response=ai_turn.message,
-                context_vectors=context_texts,
-                context_vector_data=selected_vectors,
-                all_vectors_for_cost=used_vectors,
-                timestamp_user=user_turn.created_at,
-                timestamp_ai=ai_turn.created_at,
-                vector_ids=selected_vector_ids
-            )
-            evaluations.append(evaluation)
-        
-        # Calculate overall score
-        overall_score = evaluator.calculate_overall_score(evaluations)
-        
-        # Generate summary
-        hallucinations = sum(1 for e in evaluations if e["llm_judgment"]["hallucination"])
-        llm_calls = sum(1 for e in evaluations if e["used_llm"])
-        
-        summary = {
-            "total_evaluations": len(evaluations),
-            "hallucinations_detected": hallucinations,
-            "llm_calls_made": llm_calls,
-            "cross_encoder_only": len(evaluations) - llm_calls,
-            "avg_relevance": round(
-                sum(e["llm_judgment"]["relevance_score"] for e in evaluations) / len(evaluations), 2
-            ) if evaluations else 0,
-            "avg_completeness": round(
-                sum(e["llm_judgment"]["completeness_score"] for e in evaluations) / len(evaluations), 2
-            ) if evaluations else 0,
-            "total_cost": round(
-                sum(e["metrics"]["cost_usd"] for e in evaluations), 6
-            ),
-            "avg_latency_ms": round(
-                sum(e["metrics"]["latency_ms"] for e in evaluations) / len(evaluations), 2
-            ) if evaluations else 0
-        }
+            # Overall score and summary come from the running totals
+            overall_score = state.overall_score()
+            summary = state.summary()
         
-        # Convert dicts to TurnEvaluation objects
-        from models import TurnEvaluation, HallucinationCheck, LLMJudgment, Metrics
-        
-        eval_objects = []
-        for e in evaluations:
-            eval_obj = TurnEvaluation(
-                turn=e["turn"],
-                user_query=e["user_query"],
-                ai_response=e["ai_response"],
-                entailment_check=HallucinationCheck(**e["entailment_check"]),
-                llm_judgment=LLMJudgment(**e["llm_judgment"]),
-                metrics=Metrics(**e["metrics"]),
-                scores=e.get("scores"),
-                used_llm=e["used_llm"]
-            )
-            eval_objects.append(eval_obj)
-        
-        # Build result
-        result = EvaluationResult(
-            conversation_id=request.conversation.chat_id,
-            user_id=request.conversation.user_id,
-            total_turns=len(request.conversation.conversation_turns),
-            ai_responses_evaluated=len(evaluations),
-            evaluations=eval_objects,
+        result = result_payload(
+            chat_id=conversation.chat_id,
+            user_id=conversation.user_id,
+            total_turns=len(conversation.conversation_turns),
+            evaluations=evaluations,
             overall_score=overall_score,
             summary=summary
         )
+        body = dumps(result)
         
         # Print formatted results
         print_results(result)
         
-        # Send to frontend
-        frontend_url = os.getenv('FRONTEND_URL')
-        if frontend_url:
-            try:
-                async with httpx.AsyncClient() as client:
-                    await client.post(f"{frontend_url}/api/results", json=result.dict())
-            except:
-                pass
+        # Hand off to the background publisher; the dashboard never delays the response
+        if frontend_publisher is not None:
+            frontend_publisher.publish(body)
         
-        return result
+        if tuple(turn_fields) != TURN_FIELDS:
+            result["evaluations"] = [turn_payload(e, turn_fields) for e in evaluations]
+            body = dumps(result)
+        return Response(content=body, media_type="application/json")
         
+    except JudgeOverloaded as e:
+        print(f"Judge overloaded, shedding request: {e.reason}")
+        raise HTTPException(
+            status_code=429,
+            detail=e.reason,
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
+    except VectorServiceUnavailable as e:
+        print(f"Context vectors unavailable, failing request: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         print(f"Error during evaluation: {e}")
         import traceback
@@ -195,42 +207,305 @@ async def process_evaluation(conversation: ConversationInput, context_vectors: C
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def print_results(result: EvaluationResult):
+@app.post("/api/evaluate/batch", response_model=BatchEvaluationResult)
+async def evaluate_batch(request: BatchEvaluationRequest, priority: int = -1):
+    """
+    Batch evaluation in statistical sampling mode.
+    Judges a stratified sample of AI turns (conversation length x topic
+    severity) in rounds and reports fleet-level aggregates with confidence
+    intervals, stopping once every stratum has min_per_stratum valid samples
+    and every target CI width is reached. Strata with no valid samples are
+    listed in unestimated_strata (estimate coverage < 1.0).
+    Runs below interactive priority by default.
+    """
+    options = request.sampling
+    unknown = set(options.target_ci_width) - set(METRICS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown metrics in target_ci_width: {sorted(unknown)}")
+    
+    # Population: every (user, AI) turn pair, keyed by stratum
+    strata = {}
+    for index, item in enumerate(request.requests):
+        pairs, unpaired = pair_turns(item.conversation)
+        ai_turn_count = len(pairs) + len(unpaired)
+        for user_turn, ai_turn in pairs:
+            key = stratum_key(ai_turn_count, f"{user_turn.message} {ai_turn.message}", evaluator._get_severity)
+            strata.setdefault(key, []).append((index, user_turn, ai_turn))
+    
+    sampler = StratifiedSampler(strata, seed=options.seed, min_per_stratum=options.min_per_stratum)
+    print(f"\nBatch sampling: {len(request.requests)} conversations, {sampler.population} turns, {len(strata)} strata")
+    
+    prepared_cache = {}
+    # Keep the batch well inside the judge queue so it doesn't shed its own calls
+    in_flight = asyncio.Semaphore(min(config.SAMPLING_MAX_IN_FLIGHT, max(1, config.JUDGE_QUEUE_MAX // 2)))
+    
+    async def evaluate_sample(index, user_turn, ai_turn):
+        async with in_flight:
+            if index not in prepared_cache:
+                item = request.requests[index]
+                used_vectors = await resolve_used_vectors(item.context_vectors)
+                prepared_cache[index] = (used_vectors, PreparedConversation(item.conversation, used_vectors, item.conversation.model))
+            used_vectors, prepared = prepared_cache[index]
+            return await evaluate_turn_pair(
+                user_turn, ai_turn, used_vectors, priority, prepared.metrics_by_turn.get(ai_turn.turn)
+            )
+    
+    values = {metric: {} for metric in METRICS}
+    sampled_per_stratum = {key: 0 for key in sampler.sizes}
+    estimates = {}
+    rounds = judge_calls = judge_errors = overloaded_rounds = 0
+    stopped_reason = "population_exhausted"
+    
+    while not sampler.exhausted():
+        round_size = options.min_samples if rounds == 0 else options.batch_size
+        if options.max_samples is not None:
+            round_size = min(round_size, options.max_samples - sampler.sampled)
+            if round_size <= 0:
+                stopped_reason = "max_samples"
+                break
+        
+        draws = sampler.draw(round_size)
+        results = await asyncio.gather(
+            *[evaluate_sample(*item) for _, item in draws], return_exceptions=True
+        )
+        rounds += 1
+        
+        overloaded = None
+        for (key, item), result in zip(draws, results):
+            if isinstance(result, JudgeOverloaded):
+                # Shed, never judged: back into the pool for a later round
+                sampler.give_back(key, item)
+                overloaded = result
+                continue
+            if isinstance(result, VectorServiceUnavailable):
+                raise HTTPException(status_code=503, detail=str(result), headers={"Retry-After": "5"})
+            if isinstance(result, Exception):
+                raise result
+            sampled_per_stratum[key] += 1
+            judge_calls += int(result["used_llm"])
+            if result["llm_judgment"].get("method") == "llm_judge_error":
+                judge_errors += 1
+                continue
+            index, user_turn, ai_turn = item
+            record_evaluation(request.requests[index].conversation, user_turn, ai_turn, result)
+            for metric, extract in METRICS.items():
+                values[metric].setdefault(key, []).append(extract(result))
+        
+        if any(values["overall_score"].values()):
+            estimates = {
+                metric: stratified_estimate(
+                    per_stratum, sampler.sizes, config.SAMPLING_BOOTSTRAP_RESAMPLES,
+                    options.confidence, options.seed, binary=metric in BINARY_METRICS
+                )
+                for metric, per_stratum in values.items()
+            }
+            print(f"Round {rounds}: {sampler.sampled}/{sampler.population} sampled, " + ", ".join(
+                f"{m}={e['estimate']}±{e['ci_width'] / 2:.4f}" for m, e in estimates.items()
+            ))
+        
+        if overloaded:
+            overloaded_rounds += 1
+            if overloaded_rounds > config.SAMPLING_OVERLOAD_RETRIES:
+                if not estimates:
+                    raise HTTPException(status_code=429, detail="Judge overloaded", headers={"Retry-After": "60"})
+                stopped_reason = "judge_overloaded"
+                break
+            await asyncio.sleep(min(overloaded.retry_after, 5.0))
+            continue
+        overloaded_rounds = 0
+        
+        if sampler.exhausted():
+            break
+        
+        if estimates and ready_to_stop(values["overall_score"], sampler.sizes, options.min_per_stratum) and all(
+            estimates[metric]["ci_width"] <= width for metric, width in options.target_ci_width.items()
+        ):
+            stopped_reason = "target_ci_reached"
+            break
+    
+    for metric, estimate in estimates.items():
+        estimate["target_width"] = options.target_ci_width.get(metric)
+    
+    sampled_turns = sum(sampled_per_stratum.values())
+    return BatchEvaluationResult(
+        conversations=len(request.requests),
+        population_turns=sampler.population,
+        sampled_turns=sampled_turns,
+        sampling_fraction=round(sampled_turns / sampler.population, 4) if sampler.population else 0,
+        rounds=rounds,
+        judge_calls=judge_calls,
+        judge_errors=judge_errors,
+        stopped_reason=stopped_reason,
+        confidence=options.confidence,
+        estimates=estimates,
+        strata={
+            key: {
+                "population": size,
+                "sampled": sampled_per_stratum[key],
+                "valid": len(values["overall_score"].get(key, []))
+            }
+            for key, size in sampler.sizes.items()
+        },
+        unestimated_strata=[key for key in sampler.sizes if not values["overall_score"].get(key)]
+    )
+
+
+@app.get("/api/analytics")
+async def analytics(
+    metric: str = "overall",
+    group_by: Optional[str] = None,
+    percentiles: str = "50,90,99",
+    bins: int = Query(10, ge=1, le=1000),
+    user_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+    vector_id: Optional[int] = None,
+    severity: Optional[str] = None,
+    day_from: Optional[str] = None,
+    day_to: Optional[str] = None
+):
+    """
+    Percentiles, histogram and optional group-by over stored turn evaluations.
+    metric: relevance | completeness | hallucination | overall | latency_ms | cost_usd | tokens
+    group_by: user_id | chat_id | day | severity | vector_id
+    """
+    if metric not in METRIC_COLUMNS:
+        raise HTTPException(status_code=422, detail=f"metric must be one of {list(METRIC_COLUMNS)}")
+    if group_by is not None and group_by not in GROUP_BY_COLUMNS:
+        raise HTTPException(status_code=422, detail=f"group_by must be one of {list(GROUP_BY_COLUMNS)}")
+    if severity is not None and severity not in SEVERITY_CODES:
+        raise HTTPException(status_code=422, detail=f"severity must be one of {list(SEVERITY_CODES)}")
+    try:
+        percentile_values = [float(p) for p in percentiles.split(",") if p.strip()]
+        filters = {
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "vector_id": vector_id,
+            "severity": SEVERITY_CODES[severity] if severity else None,
+            "day_from": to_day(day_from) if day_from else None,
+            "day_to": to_day(day_to) if day_to else None
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if any(not 0 <= p <= 100 for p in percentile_values):
+        raise HTTPException(status_code=422, detail="percentiles must be between 0 and 100")
+    
+    return evaluation_store.query(metric, group_by, percentile_values, bins, filters)
+
+
+@app.get("/api/analytics/rollups")
+async def analytics_rollups(group_by: str = "day"):
+    """Incrementally maintained per-group aggregates (dashboard fast path)"""
+    if group_by not in GROUP_BY_COLUMNS:
+        raise HTTPException(status_code=422, detail=f"group_by must be one of {list(GROUP_BY_COLUMNS)}")
+    return {"group_by": group_by, "groups": evaluation_store.rollup(group_by), "store": evaluation_store.stats()}
+
+
+def record_evaluation(conversation: ConversationInput, user_turn: ConversationTurn,
+                      ai_turn: ConversationTurn, evaluation: Dict):
+    """Add a fresh turn evaluation to the analytics store"""
+    try:
+        evaluation_store.add(
+            chat_id=conversation.chat_id,
+            user_id=conversation.user_id,
+            evaluation=evaluation,
+            timestamp=ai_turn.created_at,
+            severity=severity_label(f"{user_turn.message} {ai_turn.message}", evaluator._get_severity)
+        )
+    except Exception as e:
+        print(f"Error recording evaluation for analytics: {e}")
+
+
+async def resolve_used_vectors(context_vectors: ContextVectorsInput) -> List[Dict]:
+    """Vectors named in sources.vectors_used, from inline vector_data or the corpus registry"""
+    # Extract ONLY vectors_used IDs for evaluation
+    vectors_used_ids = context_vectors.data.get("sources", {}).get("vectors_used", [])
+    
+    if not vectors_used_ids:
+        print(f"Warning: No vectors_used specified, using empty context")
+        return []
+    
+    # Get only the vectors that were actually used by RAG
+    vector_data = context_vectors.data.get("vector_data", [])
+    vector_id_map = {vec.get("id"): vec for vec in vector_data}
+    
+    # Ids without inline vector_data are resolved from the encoder's corpus registry
+    missing_ids = [vid for vid in vectors_used_ids if vid not in vector_id_map]
+    if missing_ids:
+        vector_id_map.update(await vector_client.lookup_vectors(missing_ids))
+    
+    used_vectors = [vector_id_map[vid] for vid in vectors_used_ids if vid in vector_id_map]
+    print(f"Found {len(used_vectors)} vectors from vectors_used {vectors_used_ids}")
+    return used_vectors
+
+
+async def evaluate_turn_pair(user_turn: ConversationTurn, ai_turn: ConversationTurn,
+                             used_vectors: List[Dict], priority: int = 0, metrics: Optional[Dict] = None) -> Dict:
+    """Select the most relevant vector for the user query and evaluate the AI response"""
+    # Select most relevant vector using MaxSim
+    if used_vectors:
+        most_relevant_vector = await vector_client.select_most_relevant_vector(
+            user_turn.message, used_vectors
+        )
+        context_texts = [most_relevant_vector.get("text", "")] if most_relevant_vector else []
+        selected_vector_ids = [most_relevant_vector.get("id")] if most_relevant_vector else []
+        selected_vectors = [most_relevant_vector] if most_relevant_vector else []
+        print(f"Selected most relevant vector: ID {selected_vector_ids[0] if selected_vector_ids else 'None'}")
+    else:
+        context_texts = []
+        selected_vector_ids = []
+        selected_vectors = []
+    
+    return await evaluator.evaluate_turn(
+        turn_number=ai_turn.turn,
+        user_query=user_turn.message,
+        ai_response=ai_turn.message,
+        context_vectors=context_texts,
+        context_vector_data=selected_vectors,
+        all_vectors_for_cost=used_vectors,
+        timestamp_user=user_turn.created_at,
+        timestamp_ai=ai_turn.created_at,
+        vector_ids=selected_vector_ids,
+        priority=priority,
+        metrics=metrics
+    )
+
+
+def print_results(result: Dict):
     """Print formatted evaluation results to stdout"""
     
     print("\n" + "="*80)
     print("LLM EVALUATION RESULTS")
     print("="*80)
-    print(f"\nConversation ID: {result.conversation_id}")
-    print(f"User ID: {result.user_id}")
-    print(f"Total Turns: {result.total_turns}")
-    print(f"AI Responses Evaluated: {result.ai_responses_evaluated}")
-    print(f"\nOverall Score: {result.overall_score}/100")
+    print(f"\nConversation ID: {result['conversation_id']}")
+    print(f"User ID: {result['user_id']}")
+    print(f"Total Turns: {result['total_turns']}")
+    print(f"AI Responses Evaluated: {result['ai_responses_evaluated']}")
+    print(f"\nOverall Score: {result['overall_score']}/100")
     
     print("\n" + "-"*80)
     print("SUMMARY")
     print("-"*80)
-    print(f"Hallucinations Detected: {result.summary['hallucinations_detected']}")
-    print(f"LLM Calls Made: {result.summary['llm_calls_made']}")
-    print(f"Avg Relevance: {result.summary['avg_relevance']}")
-    print(f"Avg Completeness: {result.summary['avg_completeness']}")
-    print(f"Total Cost: ${result.summary['total_cost']}")
-    print(f"Avg Latency: {result.summary['avg_latency_ms']}ms")
+    print(f"Hallucinations Detected: {result['summary']['hallucinations_detected']}")
+    print(f"LLM Calls Made: {result['summary']['llm_calls_made']}")
+    print(f"Avg Relevance: {result['summary']['avg_relevance']}")
+    print(f"Avg Completeness: {result['summary']['avg_completeness']}")
+    print(f"Total Cost: ${result['summary']['total_cost']}")
+    print(f"Avg Latency: {result['summary']['avg_latency_ms']}ms")
     
     # Print detailed findings
-    for eval_result in result.evaluations:
+    for eval_result in result['evaluations']:
         print("\n" + "-"*80)
-        print(f"TURN {eval_result.turn}")
+        print(f"TURN {eval_result['turn']}")
         print("-"*80)
-        print(f"\nUser Query:\n{eval_result.user_query}")
-        ai_resp = eval_result.ai_response
+        print(f"\nUser Query:\n{eval_result['user_query']}")
+        ai_resp = eval_result['ai_response']
         print(f"\nAI Response:\n{ai_resp[:200]}..." if len(ai_resp) > 200 else f"\nAI Response:\n{ai_resp}")
         
-        if eval_result.llm_judgment.hallucination:
+        if eval_result['llm_judgment']['hallucination']:
             print(f"\nHallucination: YES")
-            if eval_result.llm_judgment.hallucinated_claims:
+            if eval_result['llm_judgment']['hallucinated_claims']:
                 print("\nHallucinated Information:")
-                for claim in eval_result.llm_judgment.hallucinated_claims:
+                for claim in eval_result['llm_judgment']['hallucinated_claims']:
                     print(f"  • {claim}")
         else:
             print(f"\nHallucination: NO")
@@ -1,35 +1,74 @@
 from datetime import datetime
 from dateutil import parser
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence, Tuple
+import numpy as np
+import config
+
+
+def parse_timestamp(timestamp: str) -> float:
+    """
+    Epoch seconds for a timestamp. ISO 8601 (the chatbot's format) takes the
+    datetime.fromisoformat fast path; anything else falls back to dateutil.
+    Returns NaN if unparseable.
+    """
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return parser.parse(timestamp).timestamp()
+    except Exception as e:
+        print(f"Error parsing timestamp {timestamp!r}: {e}")
+        return float("nan")
+
+
+def price_per_1k_tokens(model: Optional[str] = None) -> float:
+    """USD per 1000 tokens for model from MODEL_PRICING, else the default price"""
+    if model and model in config.MODEL_PRICING:
+        return config.MODEL_PRICING[model]
+    return config.DEFAULT_PRICE_PER_1K_TOKENS
 
 
 def calculate_metrics(
     timestamp_user: str,
     timestamp_ai: str,
-    context_vectors: List[Dict]
+    context_vectors: List[Dict],
+    model: Optional[str] = None
 ) -> Dict:
     """
     Calculate latency and cost metrics
     """
-    
+    return calculate_metrics_batch([(timestamp_user, timestamp_ai)], context_vectors, model)[0]
+
+
+def calculate_metrics_batch(
+    timestamps: Sequence[Tuple[str, str]],
+    context_vectors: List[Dict],
+    model: Optional[str] = None
+) -> List[Dict]:
+    """
+    Latency, tokens and cost for many (user, AI) timestamp pairs at once.
+    Every turn is charged for the same context vectors.
+    """
+    if not timestamps:
+        return []
+
     # Calculate latency
-    try:
-        time_user = parser.parse(timestamp_user)
-        time_ai = parser.parse(timestamp_ai)
-        latency_ms = (time_ai - time_user).total_seconds() * 1000
-    except Exception as e:
-        print(f"Error calculating latency: {e}")
-        latency_ms = 0.0
-    
+    times = np.array([[parse_timestamp(u), parse_timestamp(a)] for u, a in timestamps], dtype=np.float64)
+    latency_ms = np.nan_to_num((times[:, 1] - times[:, 0]) * 1000, nan=0.0)
+    latency_ms = np.round(latency_ms, 2)
+
     # Calculate tokens used
     tokens_used = sum(vec.get("tokens", 0) for vec in context_vectors)
-    
-    # Estimate cost (example: $0.0001 per 1000 tokens)
-    cost_per_1k_tokens = 0.0001
-    cost_usd = (tokens_used / 1000) * cost_per_1k_tokens
-    
-    return {
-        "latency_ms": round(latency_ms, 2),
-        "cost_usd": round(cost_usd, 6),
-        "tokens_used": tokens_used
-    }
+
+    # Estimate cost from the per-model pricing table
+    cost_usd = round((tokens_used / 1000) * price_per_1k_tokens(model), 6)
+
+    return [
+        {
+            "latency_ms": float(latency),
+            "cost_usd": cost_usd,
+            "tokens_used": tokens_used
+        }
+        for latency in latency_ms
+    ]
@@ -15,6 +15,7 @@ class ConversationInput(BaseModel):
     chat_id: int
     user_id: int
     conversation_turns: List[ConversationTurn]
+    model: Optional[str] = None  # chatbot model, selects the MODEL_PRICING entry
 
 
 class VectorData(BaseModel):
@@ -57,6 +58,8 @@ class LLMJudgment(BaseModel):
     completeness_score: float
     missing_info: List[str]
     method: str
+    judge_model: Optional[str] = None
+    judge_tier: Optional[str] = None
 
 
 class Metrics(BaseModel):
@@ -74,6 +77,7 @@ class TurnEvaluation(BaseModel):
     metrics: Metrics
     scores: Optional[Dict[str, float]] = None
     used_llm: bool
+    vector_ids: Optional[List[int]] = None
 
 
 class EvaluationResult(BaseModel):
@@ -84,3 +88,46 @@ class EvaluationResult(BaseModel):
     evaluations: List[TurnEvaluation]
     overall_score: float
     summary: Dict[str, Any]
+
+
+class SamplingOptions(BaseModel):
+    target_ci_width: Dict[str, float] = Field(default_factory=lambda: {
+        "avg_relevance": 0.05,
+        "hallucination_rate": 0.05,
+        "overall_score": 5.0
+    })
+    confidence: float = 0.95
+    min_samples: int = 20
+    min_per_stratum: int = 5  # valid samples each stratum needs before target_ci_width is checked
+    batch_size: int = 10
+    max_samples: Optional[int] = None
+    seed: Optional[int] = None
+
+
+class BatchEvaluationRequest(BaseModel):
+    requests: List[EvaluationRequest]
+    sampling: SamplingOptions = Field(default_factory=SamplingOptions)
+
+
+class MetricEstimate(BaseModel):
+    estimate: float
+    ci_low: float
+    ci_high: float
+    ci_width: float
+    coverage: float = 1.0
+    target_width: Optional[float] = None
+
+
+class BatchEvaluationResult(BaseModel):
+    conversations: int
+    population_turns: int
+    sampled_turns: int
+    sampling_fraction: float
+    rounds: int
+    judge_calls: int
+    judge_errors: int
+    stopped_reason: str
+    confidence: float
+    estimates: Dict[str, MetricEstimate]
+    strata: Dict[str, Dict[str, int]]
+    unestimated_strata: List[str] = Field(default_factory=list)
@@ -0,0 +1,175 @@
+import math
+import random
+import numpy as np
+from statistics import NormalDist
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import config
+
+SEVERITY_LABELS = {1.0: "critical", 0.7: "high", 0.5: "medium", 0.3: "low"}
+
+
+def length_bucket(ai_turn_count: int) -> str:
+    """Conversation length stratum from SAMPLING_LENGTH_BUCKETS (e.g. '4,10')"""
+    short_max, medium_max = config.SAMPLING_LENGTH_BUCKETS
+    if ai_turn_count <= short_max:
+        return "short"
+    if ai_turn_count <= medium_max:
+        return "medium"
+    return "long"
+
+
+def severity_label(text: str, get_severity: Callable[[str], float]) -> str:
+    """Topic severity name for text using Evaluator._get_severity keywords"""
+    return SEVERITY_LABELS.get(get_severity(text), "medium")
+
+
+def stratum_key(ai_turn_count: int, text: str, get_severity: Callable[[str], float]) -> str:
+    """Stratum = conversation length bucket x topic severity"""
+    return f"{length_bucket(ai_turn_count)}/{severity_label(text, get_severity)}"
+
+
+class StratifiedSampler:
+    """
+    Draws items without replacement, allocating each round across strata in
+    proportion to stratum size (every non-empty stratum gets at least
+    min_per_stratum items so its variance can be estimated).
+    """
+
+    def __init__(self, strata: Dict[str, List[Any]], seed: Optional[int] = None, min_per_stratum: int = 2):
+        rng = random.Random(seed)
+        self.pools = {h: rng.sample(items, len(items)) for h, items in strata.items() if items}
+        self.sizes = {h: len(items) for h, items in self.pools.items()}
+        self.taken = {h: 0 for h in self.pools}
+        self.min_per_stratum = min_per_stratum
+
+    @property
+    def population(self) -> int:
+        return sum(self.sizes.values())
+
+    @property
+    def sampled(self) -> int:
+        return sum(self.taken.values())
+
+    def exhausted(self) -> bool:
+        return self.sampled >= self.population
+
+    def draw(self, n: int) -> List[Tuple[str, Any]]:
+        target_total = min(self.population, self.sampled + n)
+        draws = []
+        for h, size in self.sizes.items():
+            target = max(
+                math.ceil(size / self.population * target_total),
+                min(self.min_per_stratum, size)
+            )
+            take = min(size, target) - self.taken[h]
+            if take > 0:
+                draws.extend((h, item) for item in self.pools[h][self.taken[h]:self.taken[h] + take])
+                self.taken[h] += take
+
+        # Rounding can leave a round empty while items remain; top up from the largest pool
+        if not draws and not self.exhausted():
+            h = max(self.sizes, key=lambda k: self.sizes[k] - self.taken[k])
+            take = min(n, self.sizes[h] - self.taken[h])
+            draws.extend((h, item) for item in self.pools[h][self.taken[h]:self.taken[h] + take])
+            self.taken[h] += take
+        return draws
+
+    def give_back(self, h: str, item: Any):
+        """Return a drawn item that was never evaluated (e.g. shed by the judge) to its pool"""
+        pool = self.pools[h]
+        i = pool.index(item, 0, self.taken[h])
+        pool.append(pool.pop(i))
+        self.taken[h] -= 1
+
+
+def wilson_interval(p: float, n: float, confidence: float) -> Tuple[float, float]:
+    """Wilson score interval for a proportion p observed over n trials"""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def stratified_estimate(values: Dict[str, List[float]], sizes: Dict[str, int],
+                        resamples: int, confidence: float, seed: Optional[int] = None,
+                        binary: bool = False) -> Dict[str, float]:
+    """
+    Stratified mean with a confidence interval. Strata whose population was
+    fully sampled contribute their exact mean.
+
+    Continuous metrics use a stratified-bootstrap percentile CI. Binary
+    metrics use a Wilson interval on the Kish effective sample size, so an
+    all-zero sample (the usual hallucination case) still gets a non-zero
+    width that shrinks with n.
+
+    Weights are normalised over the strata that have values; coverage is
+    the share of the population those strata represent (below 1.0 means
+    some strata are missing from the estimate).
+    """
+    sampled = {h: np.asarray(v, dtype=float) for h, v in values.items() if v}
+    population = sum(sizes.values())
+    total = sum(sizes[h] for h in sampled)
+    alpha = (1 - confidence) / 2
+
+    estimate = 0.0
+    for h, v in sampled.items():
+        estimate += sizes[h] / total * v.mean()
+
+    if binary:
+        # Variance of the stratified proportion with finite population correction
+        variance = 0.0
+        n = 0
+        for h, v in sampled.items():
+            weight = sizes[h] / total
+            n += len(v)
+            if len(v) < sizes[h]:
+                p_h = v.mean()
+                fpc = (sizes[h] - len(v)) / sizes[h]
+                variance += weight ** 2 * fpc * p_h * (1 - p_h) / len(v)
+        if variance > 0 and 0 < estimate < 1:
+            n = min(n, estimate * (1 - estimate) / variance)
+        if all(len(v) >= sizes[h] for h, v in sampled.items()):
+            low = high = estimate
+        else:
+            low, high = wilson_interval(estimate, n, confidence)
+    else:
+        rng = np.random.default_rng(seed)
+        boot = np.zeros(resamples)
+        for h, v in sampled.items():
+            weight = sizes[h] / total
+            if len(v) >= sizes[h]:
+                boot += weight * v.mean()
+            else:
+                idx = rng.integers(0, len(v), size=(resamples, len(v)))
+                boot += weight * v[idx].mean(axis=1)
+        low, high = np.quantile(boot, [alpha, 1 - alpha])
+
+    return {
+        "estimate": round(float(estimate), 4),
+        "ci_low": round(float(low), 4),
+        "ci_high": round(float(high), 4),
+        "ci_width": round(float(high - low), 4),
+        "coverage": round(total / population, 4) if population else 0.0
+    }
+
+
+def ready_to_stop(values: Dict[str, List[float]], sizes: Dict[str, int], min_per_stratum: int) -> bool:
+    """
+    CI widths are only trusted once every stratum has min_per_stratum valid
+    values (or all of its population); a stratum whose samples all errored
+    blocks the stop instead of silently dropping out of the weights.
+    """
+    return all(len(values.get(h, [])) >= min(min_per_stratum, size) for h, size in sizes.items())
+
+
+# Aggregates estimated in sampling mode: per-turn value extractors
+METRICS: Dict[str, Callable[[Dict], float]] = {
+    "avg_relevance": lambda e: float(e["llm_judgment"]["relevance_score"]),
+    "avg_completeness": lambda e: float(e["llm_judgment"]["completeness_score"]),
+    "hallucination_rate": lambda e: 1.0 if e["llm_judgment"]["hallucination"] else 0.0,
+    "overall_score": lambda e: e.get("scores", {}).get("overall", 0) * 100
+}
+
+# Metrics that are proportions of 0/1 values (Wilson interval instead of bootstrap)
+BINARY_METRICS = {"hallucination_rate"}
@@ -0,0 +1,58 @@
+import orjson
+from typing import Dict, List, Optional, Sequence, Tuple
+from models import LLMJudgment, TurnEvaluation
+
+TURN_FIELDS = tuple(TurnEvaluation.model_fields)
+JUDGMENT_FIELDS = tuple(LLMJudgment.model_fields)
+
+# Compact responses drop the echoed user/AI texts and the raw judge output
+COMPACT_TURN_FIELDS = ("turn", "scores", "metrics", "used_llm", "vector_ids")
+
+
+def dumps(payload) -> bytes:
+    """JSON bytes for a response payload (numpy scalars/arrays allowed)"""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def parse_fields(fields: Optional[str], compact: bool = False) -> Tuple[str, ...]:
+    """
+    Per-turn fields to return: an explicit comma-separated list, the compact
+    set, or everything. Raises ValueError for unknown field names.
+    """
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in selected if f not in TURN_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}; choose from {list(TURN_FIELDS)}")
+        if "turn" not in selected:
+            selected = ("turn",) + selected
+        return selected
+    if compact:
+        return COMPACT_TURN_FIELDS
+    return TURN_FIELDS
+
+
+def turn_payload(evaluation: Dict, fields: Sequence[str] = TURN_FIELDS) -> Dict:
+    """TurnEvaluation-shaped dict for a stored evaluation, limited to fields"""
+    payload = {}
+    for name in fields:
+        value = evaluation.get(name)
+        if name == "llm_judgment":
+            # Internal keys (confidence, escalation reasons, dedup distance) stay out of the response
+            value = {key: value.get(key) for key in JUDGMENT_FIELDS}
+        payload[name] = value
+    return payload
+
+
+def result_payload(chat_id: int, user_id: int, total_turns: int, evaluations: List[Dict],
+                   overall_score: float, summary: Dict, fields: Sequence[str] = TURN_FIELDS) -> Dict:
+    """EvaluationResult-shaped dict built straight from the evaluation dicts"""
+    return {
+        "conversation_id": chat_id,
+        "user_id": user_id,
+        "total_turns": total_turns,
+        "ai_responses_evaluated": len(evaluations),
+        "evaluations": [turn_payload(e, fields) for e in evaluations],
+        "overall_score": overall_score,
+        "summary": summary
+    }
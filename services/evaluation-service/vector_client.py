@@ -1,9 +1,48 @@
+import hashlib
 import httpx
 from typing import List, Dict, Any, Optional
 
+
+def text_hash(text: str) -> str:
+    """Same content hash the encoder stores per registered vector"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class VectorServiceUnavailable(Exception):
+    """The encoder's corpus registry could not be reached; the request should be retried"""
+
+
 class VectorClient:
     def __init__(self, base_url: str = "http://vector-encoder:8001"):
         self.base_url = base_url
+        # Vector ids known to be in the encoder's corpus registry
+        self.registered_ids = set()
+    
+    async def lookup_vectors(self, vector_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch registered vectors (text, tokens, ...) from the encoder's corpus registry.
+        Raises VectorServiceUnavailable if the registry can't be queried, so turns are
+        never judged against a silently emptied context.
+        """
+        if not vector_ids:
+            return {}
+        
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.post(
+                    f"{self.base_url}/corpus/lookup",
+                    json={"ids": vector_ids},
+                    timeout=30.0
+                )
+                response.raise_for_status()
+                vectors = response.json().get("vectors", [])
+            except Exception as e:
+                print(f"Error looking up vectors in corpus registry: {e}")
+                raise VectorServiceUnavailable(f"Corpus registry lookup failed: {e}") from e
+        
+        found = {vec.get("id"): vec for vec in vectors}
+        self.registered_ids.update(found)
+        return found
     
     async def select_most_relevant_vector(self, user_query: str, vectors: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """Call the vector encoder service to select the most relevant vector"""
@@ -13,24 +52,47 @@ class VectorClient:
         if len(vectors) == 1:
             return vectors[0]
         
+        # Registered vectors are sent as id + text hash; the rest carry their text inline
+        registered = [vec for vec in vectors if vec.get("id") in self.registered_ids]
+        inline_vectors = [vec for vec in vectors if vec.get("id") not in self.registered_ids]
+        vectors_by_id = {vec.get("id"): vec for vec in vectors}
+        
         async with httpx.AsyncClient() as client:
             try:
-                response = await client.post(
-                    f"{self.base_url}/select-vector",
-                    json={
-                        "user_query": user_query,
-                        "vectors": vectors
-                    },
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result.get("selected_vector")
+                result = await self._select(client, user_query, registered, inline_vectors)
+                unregistered = set(result.get("unregistered_ids", []))
+                if unregistered:
+                    # Registry lost these ids or holds different text: retry once with their text inline
+                    self.registered_ids.difference_update(unregistered)
+                    result = await self._select(
+                        client, user_query,
+                        [vec for vec in registered if vec.get("id") not in unregistered],
+                        inline_vectors + [vec for vec in registered if vec.get("id") in unregistered]
+                    )
+                selected = result.get("selected_vector")
+                return vectors_by_id.get(selected.get("id"), selected) if selected else selected
             except Exception as e:
                 print(f"Error calling vector encoder service: {e}")
                 # Fallback to first vector if service fails
                 return vectors[0] if vectors else None
     
+    async def _select(self, client: httpx.AsyncClient, user_query: str,
+                      registered: List[Dict[str, Any]], inline_vectors: List[Dict[str, Any]]) -> Dict[str, Any]:
+        response = await client.post(
+            f"{self.base_url}/select-vector",
+            json={
+                "user_query": user_query,
+                "vectors": inline_vectors,
+                "vector_ids": [vec.get("id") for vec in registered],
+                "vector_hashes": {
+                    vec.get("id"): vec.get("text_hash") or text_hash(vec.get("text", "")) for vec in registered
+                }
+            },
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()
+    
     async def select_top_k_vectors(self, user_query: str, vectors: List[Dict[str, Any]], k: int = 3) -> List[Dict[str, Any]]:
         """Select top k most relevant vectors"""
         if not vectors:
@@ -0,0 +1,242 @@
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+CHUNK_SIZE = 100
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
+    """Split text into ~chunk_size word segments for MaxSim scoring"""
+    words = text.split()
+    return [' '.join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
+
+
+def text_hash(text: str) -> str:
+    """Content hash clients send with registered ids so stale registry text is detected"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CorpusRegistry:
+    """
+    Server-side store of context vectors keyed by id.
+
+    Vector metadata (text, tokens, source_url, ...) lives in index.json and the
+    precomputed chunk embeddings live in an append-only float32 file that is
+    memory-mapped for reads. Re-upserting an id appends fresh rows and leaves
+    the old ones unreferenced until compact() rewrites the file.
+
+    Several worker processes may share one directory: writes hold an flock on
+    .lock and readers call refresh() to pick up index changes by mtime.
+
+    The index records the embedding space (backend and model file) its rows
+    were encoded in. If the encoder's space or dim differs at startup, the
+    stored vectors are re-encoded with it rather than mixing spaces; the new
+    files are written alongside and swapped in only once encoding finished.
+    """
+
+    def __init__(self, directory: str, dim: int, space: str = "", encoder=None):
+        self.directory = directory
+        self.dim = dim
+        self.space = space
+        self.index_path = os.path.join(directory, "index.json")
+        self.embeddings_path = os.path.join(directory, "embeddings.f32")
+        self.lock_path = os.path.join(directory, ".lock")
+        self.index_mtime = None
+        self.vectors: Dict[int, Dict[str, Any]] = {}
+        self.rows = 0
+        self.embeddings: Optional[np.memmap] = None
+        os.makedirs(directory, exist_ok=True)
+        self._load(encoder)
+
+    def _load(self, encoder=None):
+        with self._lock():
+            stale = self._read_index()
+        if stale:
+            self._reencode(stale, encoder)
+        print(f"Corpus registry loaded: {len(self.vectors)} vectors, {self.rows} chunk rows")
+
+    def _read_index(self, reset: bool = True) -> List[Dict[str, Any]]:
+        """
+        Load index.json; returns its vectors if their embeddings are incompatible
+        (the files are left in place until _reencode replaces them). With
+        reset=False (refresh) an incompatible index is ignored.
+        """
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index.get("dim") != self.dim or index.get("space", "") != self.space:
+                print(f"Corpus index (dim {index.get('dim')}, space {index.get('space')!r}) doesn't match "
+                      f"encoder (dim {self.dim}, space {self.space!r})")
+                if not reset:
+                    self.index_mtime = os.stat(self.index_path).st_mtime_ns
+                    return []
+                return [
+                    {"id": int(k), **{f: v for f, v in record.items() if f not in ("offset", "count")}}
+                    for k, record in index.get("vectors", {}).items()
+                ]
+            self.vectors = {int(k): v for k, v in index.get("vectors", {}).items()}
+            self.rows = index.get("rows", 0)
+            self.index_mtime = os.stat(self.index_path).st_mtime_ns
+        self._remap()
+        return []
+
+    @contextmanager
+    def _lock(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """Reload the index if another process has rewritten it"""
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self.index_mtime:
+            self._read_index(reset=False)
+
+    def _remap(self):
+        if self.rows:
+            self.embeddings = np.memmap(
+                self.embeddings_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim)
+            )
+        else:
+            self.embeddings = None
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "space": self.space, "rows": self.rows, "vectors": self.vectors}, f)
+        os.replace(tmp_path, self.index_path)
+        self.index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    @staticmethod
+    def _encode(vectors: List[Dict[str, Any]], encoder) -> List[tuple]:
+        encoded = []
+        for vector in vectors:
+            chunks = chunk_text(vector.get("text", ""))
+            embeddings = np.asarray(encoder.encode(chunks), dtype=np.float32) if chunks else None
+            encoded.append((vector, embeddings))
+        return encoded
+
+    def _add_records(self, encoded: List[tuple]) -> List[np.ndarray]:
+        """Index records for encoded vectors appended after self.rows; returns their embedding blocks"""
+        new_rows = []
+        pending = 0
+        for vector, embeddings in encoded:
+            record = {k: v for k, v in vector.items() if k != "id"}
+            record["text_hash"] = text_hash(vector.get("text", ""))
+            record["offset"] = self.rows + pending
+            record["count"] = 0 if embeddings is None else len(embeddings)
+            if embeddings is not None:
+                new_rows.append(embeddings)
+                pending += len(embeddings)
+            self.vectors[int(vector["id"])] = record
+        return new_rows
+
+    def _reencode(self, stale: List[Dict[str, Any]], encoder=None):
+        """
+        Replace an index from another embedding space. The old files stay in
+        place while encoding; the new embeddings and index are written to temp
+        files and swapped in under the lock, embeddings first, so a crash at any
+        point leaves an index that is either the old one (re-encoded again on
+        the next start) or the complete new one.
+        """
+        if encoder is None:
+            print(f"Dropping {len(stale)} corpus vectors: no encoder to re-encode them with")
+            stale = []
+        else:
+            print(f"Re-encoding {len(stale)} corpus vectors in embedding space {self.space}...")
+        encoded = self._encode(stale, encoder)
+
+        with self._lock():
+            # Another worker may have finished the same re-encode while we were encoding
+            if not self._read_index():
+                return
+            self.vectors = {}
+            self.rows = 0
+            new_rows = self._add_records(encoded)
+            tmp_path = self.embeddings_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                for block in new_rows:
+                    f.write(block.tobytes())
+            self.embeddings = None
+            os.replace(tmp_path, self.embeddings_path)
+            self.rows = sum(len(block) for block in new_rows)
+            self._remap()
+            self._save_index()
+
+    def upsert(self, vectors: List[Dict[str, Any]], encoder) -> int:
+        """Encode and store chunk embeddings for each vector; returns count stored"""
+        # Encode outside the lock, then append under it
+        encoded = self._encode(vectors, encoder)
+
+        with self._lock():
+            self.refresh()
+            new_rows = self._add_records(encoded)
+            if new_rows:
+                block = np.vstack(new_rows)
+                with open(self.embeddings_path, "ab") as f:
+                    f.write(block.tobytes())
+                self.rows += len(block)
+                self._remap()
+            self._save_index()
+        return len(vectors)
+
+    def get(self, vector_id: int) -> Optional[Dict[str, Any]]:
+        """Vector metadata in request shape (id, text, tokens, ...)"""
+        record = self.vectors.get(vector_id)
+        if record is None:
+            return None
+        vector = {"id": vector_id}
+        vector.update({k: v for k, v in record.items() if k not in ("offset", "count")})
+        return vector
+
+    def matches(self, vector_id: int, expected_hash: str) -> bool:
+        """True if vector_id is registered with text hashing to expected_hash"""
+        record = self.vectors.get(vector_id)
+        if record is None:
+            return False
+        stored = record.get("text_hash") or text_hash(record.get("text", ""))
+        return stored == expected_hash
+
+    def chunk_embeddings(self, vector_id: int) -> Optional[np.ndarray]:
+        record = self.vectors.get(vector_id)
+        if record is None or not record["count"]:
+            return None
+        return self.embeddings[record["offset"]:record["offset"] + record["count"]]
+
+    def __contains__(self, vector_id: int) -> bool:
+        return vector_id in self.vectors
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def compact(self):
+        """Rewrite the embedding file keeping only rows referenced by live vectors"""
+        with self._lock():
+            self.refresh()
+            blocks = []
+            offset = 0
+            for record in self.vectors.values():
+                if record["count"]:
+                    blocks.append(np.array(self.embeddings[record["offset"]:record["offset"] + record["count"]]))
+                record["offset"] = offset
+                offset += record["count"]
+
+            tmp_path = self.embeddings_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                for block in blocks:
+                    f.write(block.tobytes())
+            self.embeddings = None
+            os.replace(tmp_path, self.embeddings_path)
+            self.rows = offset
+            self._remap()
+            self._save_index()
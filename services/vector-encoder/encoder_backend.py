@@ -0,0 +1,143 @@
+import json
+import os
+import numpy as np
+from typing import List
+
+MODEL_NAME = os.getenv("ENCODER_MODEL", "all-MiniLM-L6-v2")
+# Directory holding baked/volume-mounted model artifacts (see export_onnx.py)
+MODEL_DIR = os.getenv("MODEL_DIR", "/models")
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", "0"))
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "model_int8.onnx")
+
+WARMUP_TEXTS = [
+    "What is the cost of an IVF cycle?",
+    "We offer accommodation near the clinic for patients travelling from overseas.",
+]
+
+
+def torch_model_path() -> str:
+    """Local SentenceTransformer directory if baked in, else the hub name"""
+    path = os.path.join(MODEL_DIR, MODEL_NAME)
+    return path if os.path.isdir(path) else MODEL_NAME
+
+
+def onnx_model_dir() -> str:
+    return os.path.join(MODEL_DIR, f"{MODEL_NAME}-onnx")
+
+
+class TorchEncoder:
+    """SentenceTransformer in PyTorch fp32 (reference backend)"""
+
+    name = "torch"
+
+    def __init__(self, threads: int = ENCODER_THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(torch_model_path())
+        # Identifies the embedding space (persisted corpus embeddings are only reused within one)
+        self.embedding_space = f"torch:{MODEL_NAME}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class OnnxEncoder:
+    """
+    ONNX Runtime backend over the exported (optionally int8-quantized)
+    transformer. Reproduces the SentenceTransformer pipeline: tokenize,
+    run the transformer, mean-pool over the attention mask, L2-normalize.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str = None, model_file: str = ONNX_MODEL_FILE,
+                 threads: int = ENCODER_THREADS, batch_size: int = 32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        self.embedding_space = f"onnx:{MODEL_NAME}/{model_file}"
+
+        model_dir = model_dir or onnx_model_dir()
+        with open(os.path.join(model_dir, "encoder_config.json")) as f:
+            encoder_config = json.load(f)
+        self.dim = encoder_config["dim"]
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=encoder_config["max_seq_length"])
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([
+            self._encode_batch(texts[i:i+self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+BACKENDS = {
+    "torch": TorchEncoder,
+    "onnx": OnnxEncoder,
+}
+
+
+def load_encoder(backend: str = ENCODER_BACKEND, threads: int = ENCODER_THREADS):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ENCODER_BACKEND '{backend}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](threads=threads)
+
+
+def warmup(encoder, rounds: int = 2):
+    """Run a few encodes so first real requests don't pay lazy-init costs"""
+    for _ in range(rounds):
+        encoder.encode(WARMUP_TEXTS)
+
+
+def check_parity(reference, candidate, texts: List[str], min_cosine: float = 0.98) -> float:
+    """
+    Compare two backends on the same texts; returns the worst per-text cosine
+    similarity and raises if it falls below min_cosine.
+    """
+    ref = np.asarray(reference.encode(texts), dtype=np.float32)
+    cand = np.asarray(candidate.encode(texts), dtype=np.float32)
+    ref = ref / np.linalg.norm(ref, axis=1, keepdims=True)
+    cand = cand / np.linalg.norm(cand, axis=1, keepdims=True)
+    worst = float(np.min(np.sum(ref * cand, axis=1)))
+    if worst < min_cosine:
+        raise AssertionError(
+            f"{candidate.name} backend parity check failed: min cosine {worst:.4f} < {min_cosine}"
+        )
+    return worst
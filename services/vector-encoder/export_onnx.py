@@ -0,0 +1,92 @@
+"""
+Bake encoder model artifacts into MODEL_DIR:
+  <MODEL_DIR>/<model>/          SentenceTransformer (torch backend, no hub download at boot)
+  <MODEL_DIR>/<model>-onnx/     ONNX export, int8 dynamic-quantized copy, tokenizer
+
+Runs a parity check of the int8 ONNX backend against torch and exits
+non-zero if embeddings drift past --min-cosine.
+
+Usage: python export_onnx.py [--output /models] [--min-cosine 0.98]
+"""
+import argparse
+import json
+import os
+import torch
+from sentence_transformers import SentenceTransformer
+from onnxruntime.quantization import quantize_dynamic, QuantType
+import encoder_backend
+from encoder_backend import OnnxEncoder, TorchEncoder, check_parity
+
+PARITY_TEXTS = encoder_backend.WARMUP_TEXTS + [
+    "Please give me the mailing address for the clinic.",
+    "Gopal Mansion offers air-conditioned rooms with TV and bath for Rs 800 per night.",
+    "Our success rates depend on age, diagnosis and the number of embryos transferred.",
+]
+
+
+def export(output_dir: str, model_name: str):
+    torch_dir = os.path.join(output_dir, model_name)
+    onnx_dir = os.path.join(output_dir, f"{model_name}-onnx")
+    os.makedirs(onnx_dir, exist_ok=True)
+
+    print(f"Saving SentenceTransformer '{model_name}' to {torch_dir}...")
+    model = SentenceTransformer(model_name)
+    model.save(torch_dir)
+
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    tokenizer.save_pretrained(onnx_dir)
+
+    sample = tokenizer(["warmup sentence"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(onnx_dir, "model.onnx")
+    print(f"Exporting ONNX graph to {fp32_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    int8_path = os.path.join(onnx_dir, "model_int8.onnx")
+    print(f"Quantizing to int8 at {int8_path}...")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    with open(os.path.join(onnx_dir, "encoder_config.json"), "w") as f:
+        json.dump({
+            "model": model_name,
+            "dim": model.get_sentence_embedding_dimension(),
+            "max_seq_length": model.max_seq_length,
+        }, f)
+
+    return onnx_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=encoder_backend.MODEL_DIR)
+    parser.add_argument("--model", default=encoder_backend.MODEL_NAME)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    # Point the backends at the freshly written artifacts
+    encoder_backend.MODEL_DIR = args.output
+    encoder_backend.MODEL_NAME = args.model
+    onnx_dir = export(args.output, args.model)
+
+    reference = TorchEncoder()
+    for model_file in ("model.onnx", "model_int8.onnx"):
+        candidate = OnnxEncoder(model_dir=onnx_dir, model_file=model_file)
+        worst = check_parity(reference, candidate, PARITY_TEXTS, args.min_cosine)
+        print(f"Parity {model_file} vs torch: min cosine {worst:.4f}")
+
+
+if __name__ == "__main__":
+    main()
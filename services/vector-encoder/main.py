@@ -1,22 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
+from encoder_backend import load_encoder, warmup, ENCODER_BACKEND, ENCODER_THREADS
 from sklearn.metrics.pairwise import cosine_similarity
+from corpus import CorpusRegistry, chunk_text, text_hash
 import numpy as np
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Optional
 
 app = FastAPI(title="Vector Encoder Service", version="1.0.0")
 
 # Global encoder instance
 encoder = None
+corpus = None
+
+CORPUS_DIR = os.getenv("CORPUS_DIR", "/data/corpus")
 
 class VectorSelectionRequest(BaseModel):
     user_query: str
-    vectors: List[Dict[str, Any]]
+    vectors: List[Dict[str, Any]] = []
+    vector_ids: Optional[List[int]] = None
+    vector_hashes: Dict[int, str] = {}  # text_hash per registered id, checked against the registry
 
 class VectorSelectionResponse(BaseModel):
     selected_vector: Dict[str, Any]
     similarity_score: float
+    unregistered_ids: List[int] = []  # vector_ids not served from the registry (missing or text changed)
 
 class SimilarityRequest(BaseModel):
     text1: str
@@ -25,16 +33,42 @@ class SimilarityRequest(BaseModel):
 class SimilarityResponse(BaseModel):
     similarity: float
 
+class CorpusUpsertRequest(BaseModel):
+    vectors: List[Dict[str, Any]]
+
+class CorpusUpsertResponse(BaseModel):
+    upserted: int
+    total: int
+
+class CorpusLookupRequest(BaseModel):
+    ids: List[int]
+
+class CorpusLookupResponse(BaseModel):
+    vectors: List[Dict[str, Any]]
+    missing: List[int]
+
+def preload(threads: int = ENCODER_THREADS):
+    """Load and warm the encoder; serve.py calls this in the master before forking"""
+    global encoder
+    print(f"Loading sentence transformer model ({ENCODER_BACKEND} backend)...")
+    encoder = load_encoder(threads=threads)
+    print("Running warmup pass...")
+    warmup(encoder)
+
 @app.on_event("startup")
 async def startup_event():
-    global encoder
-    print("Loading sentence transformer model...")
-    encoder = SentenceTransformer('all-MiniLM-L6-v2')
-    print("Vector Encoder Service ready!")
+    global corpus
+    if encoder is None:
+        preload()
+    corpus = CorpusRegistry(
+        CORPUS_DIR, encoder.get_sentence_embedding_dimension(), encoder.embedding_space, encoder
+    )
+    print(f"Vector Encoder Service ready! (pid {os.getpid()})")
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    # Uvicorn only accepts connections after startup_event (model load, warmup, corpus) returns
+    return {"status": "healthy", "backend": encoder.name}
 
 @app.post("/similarity", response_model=SimilarityResponse)
 async def calculate_similarity(request: SimilarityRequest):
@@ -44,20 +78,79 @@ async def calculate_similarity(request: SimilarityRequest):
     similarity = float(cosine_similarity(emb1, emb2)[0][0])
     return SimilarityResponse(similarity=similarity)
 
+@app.post("/corpus/upsert", response_model=CorpusUpsertResponse)
+async def upsert_corpus(request: CorpusUpsertRequest):
+    """Register vectors and precompute their chunk embeddings"""
+    invalid = [v for v in request.vectors if v.get("id") is None]
+    if invalid:
+        raise HTTPException(status_code=422, detail="Every vector needs an id")
+    upserted = corpus.upsert(request.vectors, encoder)
+    return CorpusUpsertResponse(upserted=upserted, total=len(corpus))
+
+@app.post("/corpus/lookup", response_model=CorpusLookupResponse)
+async def lookup_corpus(request: CorpusLookupRequest):
+    """Fetch registered vectors (text and metadata) by id"""
+    corpus.refresh()
+    vectors = []
+    missing = []
+    for vector_id in request.ids:
+        vector = corpus.get(vector_id)
+        if vector is None:
+            missing.append(vector_id)
+        else:
+            vectors.append(vector)
+    return CorpusLookupResponse(vectors=vectors, missing=missing)
+
+@app.post("/corpus/compact")
+async def compact_corpus():
+    """Drop embedding rows left behind by re-upserted vectors"""
+    corpus.compact()
+    return {"vectors": len(corpus), "rows": corpus.rows}
+
 @app.post("/select-vector", response_model=VectorSelectionResponse)
 async def select_most_relevant_vector(request: VectorSelectionRequest):
-    """Select the most relevant vector based on cosine similarity with user query"""
+    """
+    Select the most relevant vector based on cosine similarity with user query.
+    Candidates are the inline vectors plus registry vectors named in vector_ids
+    and not sent inline. A vector_ids entry uses its stored chunk embeddings
+    only if it is registered and its stored text hash matches vector_hashes
+    (or the inline text, if sent); otherwise the inline text is chunked and
+    encoded per request. Ids that could not be served from the registry come
+    back in unregistered_ids so the client can resend them inline.
+    """
+    if request.vector_ids:
+        corpus.refresh()
+    inline_by_id = {vec.get('id'): vec for vec in request.vectors}
+    candidates = []
+    registered_ids = set()
+    unregistered_ids = []
+    for vector_id in request.vector_ids or []:
+        inline = inline_by_id.get(vector_id)
+        expected = request.vector_hashes.get(vector_id)
+        if expected is None and inline is not None:
+            expected = text_hash(inline.get('text', ''))
+        if vector_id in corpus and (expected is None or corpus.matches(vector_id, expected)):
+            candidates.append(inline if inline is not None else corpus.get(vector_id))
+            registered_ids.add(vector_id)
+            inline_by_id.pop(vector_id, None)
+            continue
+        unregistered_ids.append(vector_id)
+        if inline is None:
+            print(f"Vector {vector_id} not registered (or text changed) and not sent inline, skipping")
+    candidates.extend(inline_by_id.values())
     
-    if not request.vectors:
+    if not candidates:
         return VectorSelectionResponse(
             selected_vector={},
-            similarity_score=0.0
+            similarity_score=0.0,
+            unregistered_ids=unregistered_ids
         )
     
-    if len(request.vectors) == 1:
+    if len(candidates) == 1:
         return VectorSelectionResponse(
-            selected_vector=request.vectors[0],
-            similarity_score=1.0
+            selected_vector=candidates[0],
+            similarity_score=1.0,
+            unregistered_ids=unregistered_ids
         )
     
     # Encode user query
@@ -65,21 +158,18 @@ async def select_most_relevant_vector(request: VectorSelectionRequest):
     
     # MaxSim: chunk long texts and take max similarity
     max_scores = []
-    for vector in request.vectors:
-        text = vector.get('text', '')
-        words = text.split()
+    for vector in candidates:
+        if vector.get('id') in registered_ids:
+            chunk_embeddings = corpus.chunk_embeddings(vector['id'])
+        else:
+            # Chunk into ~100 word segments and encode all chunks
+            chunks = chunk_text(vector.get('text', ''))
+            chunk_embeddings = encoder.encode(chunks) if chunks else None
         
-        # Chunk into ~100 word segments
-        chunk_size = 100
-        chunks = [' '.join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size)]
-        
-        if not chunks:
+        if chunk_embeddings is None:
             max_scores.append(0.0)
             continue
         
-        # Encode all chunks
-        chunk_embeddings = encoder.encode(chunks)
-        
         # Get max similarity across all chunks
         chunk_sims = cosine_similarity(query_embedding, chunk_embeddings)[0]
         max_scores.append(float(np.max(chunk_sims)))
@@ -88,16 +178,17 @@ async def select_most_relevant_vector(request: VectorSelectionRequest):
     
     # Log all similarity scores
     print(f"\nQuery: {request.user_query[:100]}...")
-    for vec, score in zip(request.vectors, max_scores):
+    for vec, score in zip(candidates, max_scores):
         print(f"  Vector {vec.get('id')}: MaxSim={score:.4f}")
     
     # Find most similar vector
     most_similar_idx = np.argmax(max_scores)
-    print(f"Selected: Vector {request.vectors[most_similar_idx].get('id')} with MaxSim {max_scores[most_similar_idx]:.4f}\n")
+    print(f"Selected: Vector {candidates[most_similar_idx].get('id')} with MaxSim {max_scores[most_similar_idx]:.4f}\n")
     
     return VectorSelectionResponse(
-        selected_vector=request.vectors[most_similar_idx],
-        similarity_score=float(max_scores[most_similar_idx])
+        selected_vector=candidates[most_similar_idx],
+        similarity_score=float(max_scores[most_similar_idx]),
+        unregistered_ids=unregistered_ids
     )
 
 if __name__ == "__main__":
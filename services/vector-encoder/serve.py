@@ -0,0 +1,143 @@
+"""
+Pre-fork server for the vector encoder.
+
+The master process loads and warms the encoder once, binds the listening
+socket, then forks ENCODER_WORKERS uvicorn workers. Workers inherit the
+model weights copy-on-write, so adding workers adds request-handling cores
+without adding a model copy per worker. Crashed workers are respawned,
+with exponential backoff while they keep failing soon after start; after
+ENCODER_MAX_FAST_FAILURES such failures in a row the master gives up.
+
+Each worker runs inference single-threaded by default (ENCODER_THREADS=1):
+scale across cores with workers, and keep thread pools from being created
+in the master before fork.
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+import uvicorn
+import main
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8001"))
+ENCODER_WORKERS = int(os.getenv("ENCODER_WORKERS", "1"))
+PREFORK_THREADS = int(os.getenv("ENCODER_THREADS", "1"))
+# A worker exiting within ENCODER_MIN_UPTIME seconds of its start counts as a fast failure
+ENCODER_MIN_UPTIME = float(os.getenv("ENCODER_MIN_UPTIME", "10"))
+ENCODER_MAX_FAST_FAILURES = int(os.getenv("ENCODER_MAX_FAST_FAILURES", "5"))
+ENCODER_RESPAWN_BACKOFF_MAX = float(os.getenv("ENCODER_RESPAWN_BACKOFF_MAX", "30"))
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket) -> bool:
+    """Serve until shutdown; False if the server never started (e.g. startup failed)"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(main.app, log_level="info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    return server.started
+
+
+def spawn(sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            if run_worker(sock):
+                code = 0
+        except SystemExit as e:
+            # uvicorn exits with status 3 when application startup fails
+            if isinstance(e.code, int) and e.code:
+                code = e.code
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    print(f"Started encoder worker {pid}")
+    return pid
+
+
+def serve(workers: int = ENCODER_WORKERS):
+    if workers <= 1:
+        main.preload()
+        uvicorn.run(main.app, host=HOST, port=PORT)
+        return
+
+    main.preload(threads=PREFORK_THREADS)
+    sock = bind_socket(HOST, PORT)
+
+    # Move everything allocated so far out of the GC's reach so collections
+    # in workers don't write to (and un-share) the master's pages
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+    fast_failures = 0
+    exit_code = 0
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for _ in range(workers):
+        children[spawn(sock)] = time.monotonic()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if stopping:
+            continue
+
+        code = os.waitstatus_to_exitcode(status)
+        if started is not None and time.monotonic() - started < ENCODER_MIN_UPTIME:
+            fast_failures += 1
+        else:
+            fast_failures = 0
+        if fast_failures >= ENCODER_MAX_FAST_FAILURES:
+            print(f"Encoder worker {pid} exited with code {code}; "
+                  f"{fast_failures} workers failed right after start, giving up")
+            exit_code = 1
+            shutdown(None, None)
+            continue
+
+        delay = min(ENCODER_RESPAWN_BACKOFF_MAX, 2 ** (fast_failures - 1)) if fast_failures else 0
+        print(f"Encoder worker {pid} exited with code {code}, respawning in {delay:.0f}s")
+        deadline = time.monotonic() + delay
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.2)
+        if not stopping:
+            children[spawn(sock)] = time.monotonic()
+
+    sock.close()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    serve()